@@ -3,69 +3,794 @@ This module will deal with any of our AI responsibilities
 """
 
 import random
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import chessEngine
+import chessBitboard
+import chessTransposition
 
 pieceScores = {"K": 0, "Q": 9, "R": 5, "B": 3, "N": 3, "P": 1} #dictionary of our pieces and their respective material values
 
-#positional scores
-knightScores = [[1, 1, 1, 1, 1, 1, 1, 1],
-                [1, 2, 2, 2, 2, 2, 2, 1],
-                [1, 2, 3, 3, 3, 3, 2, 1],
-                [1, 2, 3, 4, 4, 3, 2, 1],
-                [1, 2, 3, 4, 4, 3, 2, 1],
-                [1, 2, 3, 3, 3, 3, 2, 1],
-                [1, 2, 2, 2, 2, 2, 2, 1],
-                [1, 1, 1, 1, 1, 1, 1, 1]] 
-
-bishopScores = [[4, 3, 2, 1, 1, 2, 3, 4],
-                [3, 4, 3, 2, 2, 3, 4, 3],
-                [2, 3, 4, 3, 3, 4, 3, 2],
-                [1, 2, 3, 4, 4, 3, 2, 1],
-                [1, 2, 3, 4, 4, 3, 2, 1],
-                [2, 3, 4, 3, 3, 4, 3, 2],
-                [3, 4, 3, 2, 2, 3, 4, 3],
-                [4, 3, 2, 1, 1, 2, 3, 4]]
-
-queenScores = [[1, 1, 1, 3, 1, 1, 1, 1],
-               [1, 2, 3, 3, 3, 1, 1, 1],
-               [1, 4, 3, 3, 3, 4, 2, 1],
-               [1, 2, 3, 3, 3, 2, 2, 1],
-               [1, 2, 3, 3, 3, 2, 2, 1],
-               [1, 4, 3, 3, 3, 4, 2, 1],
-               [1, 1, 2, 3, 3, 1, 1, 1],
-               [1, 1, 1, 3, 1, 1, 1, 1]]
-
-rookScores = [[4, 3, 4, 4, 4, 4, 3, 4],
-              [4, 4, 4, 4, 4, 4, 4, 4],
-              [1, 1, 2, 3, 3, 2, 1, 1],
-              [1, 2, 3, 4, 4, 3, 2, 1],
-              [1, 2, 3, 4, 4, 3, 2, 1],
-              [1, 1, 2, 2, 2, 2, 1, 1],
-              [4, 4, 4, 4, 4, 4, 4, 4],
-              [4, 3, 4, 4, 4, 4, 3, 4]]
-
-whitePawnScores = [[8, 8, 8, 8, 8, 8, 8, 8],
-                   [8, 8, 8, 8, 8, 8, 8, 8],
-                   [5, 6, 6, 7, 7, 6, 6, 5],
-                   [2, 3, 3, 5, 5, 3, 3, 2],
-                   [1, 2, 3, 4, 4, 3, 2, 1],
-                   [1, 1, 2, 3, 3, 2, 1, 1],
-                   [1, 1, 1, 0, 0, 1, 1, 1],
-                   [0, 0, 0, 0, 0, 0, 0, 0]]
-
-blackPawnScores = [[0, 0, 0, 0, 0, 0, 0, 0],
-                   [1, 1, 1, 0, 0, 1, 1, 1],
-                   [1, 1, 2, 3, 3, 2, 1, 1],
-                   [1, 2, 3, 4, 4, 3, 2, 1],
-                   [2, 3, 3, 5, 5, 3, 3, 2],
-                   [5, 6, 6, 7, 7, 6, 6, 5],
-                   [8, 8, 8, 8, 8, 8, 8, 8],
-                   [8, 8, 8, 8, 8, 8, 8, 8]]
-
-piecePositionScores = {"N": knightScores, "Q": queenScores, "B": bishopScores, "R": rookScores, "bP": blackPawnScores, "wP": whitePawnScores}
-
-CHECKMATE = 1000 #score for finding a checkmate
+CHECKMATE = 100000 #score for finding a checkmate, more than all the material on the board in centipawns
+MATE_THRESHOLD = CHECKMATE - 1000 #the negamax searches score being mated as -(CHECKMATE - plies from the root), so shorter mates score higher and anything past this is a forced mate
 STALEMATE = 0  #score for finding a stalemate
 DEPTH = 3 #depth for recursive functions
+TIME_LIMIT = 2.0 #seconds the iterative deepening search can think for per move
+MAX_DEPTH = 64 #deepest iteration the iterative deepening search will start
+USE_BITBOARDS = False #True to use the bitboard backend instead of the 8x8 board backend
+TT_SIZE_MB = 16 #memory for the transposition table
+TT_POLICY = chessTransposition.DEPTH_PREFERRED #replacement policy for the transposition table
+THREADS = 1 #processes searching each position at once (Lazy SMP in chessWorker), sharing one transposition table when more than 1
+ASPIRATION_WINDOW = 50 #each iteration first searches this far either side of the last iteration's score
+USE_NULL_MOVE = True #null move pruning in the principal variation search, the default for each new Searcher
+NULL_MOVE_REDUCTION = 2 #how much shallower the search after a null move is
+NULL_MOVE_MIN_DEPTH = 2 #the shallowest depth a null move is tried at, the search after it drops straight into quiescence when the reduction reaches the horizon
+USE_LMR = True #late move reductions in the principal variation search, the default for each new Searcher
+LMR_MIN_DEPTH = 3 #moves are only reduced with at least this much depth left
+LMR_MIN_MOVES = 3 #the first few moves are never reduced
+searchPool = None #processes the root split search hands root moves to, kept for every move and game
+searchPoolWorkers = 0 #how many processes searchPool was started with
+rootBound = None #best score found so far by any root split process for the current search, a multiprocessing.Value shared with the pool
+rootSearchId = 0 #counts root split searches, so each pool process knows when a new one has started
+poolGameState = None #gameState each pool process reuses, set up from a FEN for every root move
+poolSearcher = None #Searcher each pool process reuses, so it keeps its transposition table between root moves
+DELTA_MARGIN = 200 #a capture is skipped in the quiescence search if even winning the piece plus this much can't raise the score to alpha
+DIFFICULTY_LEVELS = {"easy": (400, 150), "medium": (4000, 50), "hard": (40000, 0)} #nodes each move may search, and how many centipawns worse than the best a root move can be and still be picked at random
+PROFILED_METHODS = (("getValidMoveCodes", "moveGeneration"), ("getCaptureMoveCodes", "moveGeneration"), ("makeMove", "makeUndo"), ("undoMove", "makeUndo"),
+                    ("makeNullMove", "makeUndo"), ("undoNullMove", "makeUndo")) #gameState methods timed by Searcher.profileTime, and what their time counts as
+
+"""
+Move ordering - the sooner the best move is searched, the more of the other moves alpha beta can cut off.
+The hash move goes first, then captures with the most valuable victim and least valuable attacker first (MVV-LVA),
+then the two killer moves for this ply, then the other quiet moves by their history score.
+"""
+HASH_MOVE_SCORE = 1 << 40
+CAPTURE_SCORE = 1 << 34
+KILLER_SCORES = (1 << 33, 1 << 32) #first and second killer
+PIECE_VALUES = {piece: pieceScores[piece[1]] for piece in chessEngine.PIECES} #material value of each piece, used for MVV-LVA
+PIECE_VALUES["--"] = 0
+PIECE_VALUES["wK"] = PIECE_VALUES["bK"] = 10 #a king is never the victim, so this only makes it the last choice of attacker
+PROMOTION_VALUES = [pieceScores.get(piece, 0) for piece in chessEngine.PROMOTION_PIECES] #value gained by each promotion choice
+
+"""
+Everything a search changes while it runs - its depth, stop flag, transposition table, move ordering tables, statistics and result - kept together so searches don't share any of it.
+A game gets its own Searcher, so many games can be searched at once in one process, each from its own thread.
+The findBestMove* functions below the class are thin wrappers that search with defaultSearcher, for a program playing one game at a time.
+Pass transpositionTable to share a table between searchers (e.g. a SharedTranspositionTable for Lazy SMP), otherwise each one makes its own of ttSizeMB.
+The root moves are shuffled with the searcher's own random numbers, so a searcher made with the same seed makes the same moves with the same node counts every time.
+"""
+class Searcher():
+    def __init__(self, depth = DEPTH, transpositionTable = None, ttSizeMB = TT_SIZE_MB, seed = None):
+        self.depth = depth #depth for the fixed depth searches
+        self.random = random.Random(seed) #random numbers for shuffling and picking root moves
+        self.nodeLimit = None #nodes a search may visit before it stops, None for no limit
+        self.randomMargin = 0 #root moves up to this many centipawns worse than the best can be picked instead, 0 to always pick the best
+        self.rootBonus = None #random bonus of each root move for this search when randomMargin is set
+        if transpositionTable is None:
+            transpositionTable = chessTransposition.TranspositionTable(ttSizeMB, TT_POLICY)
+        self.transpositionTable = transpositionTable #results of positions already searched
+        self.useNullMove = USE_NULL_MOVE
+        self.useLMR = USE_LMR
+        self.rootDepth = depth #depth the current search started at
+        self.rootInCheck = False #whether the side to move at the root is in check, read off gs when the search starts since searching changes gs.inCheck
+        self.searchDeadline = None #time.perf_counter() value the search has to stop by, None for no limit
+        self.stopSearch = False #set to True (by stop) to make the search give up as soon as possible
+        self.nextMove = None #best move found at the root so far
+        self.completedDepth = 0 #deepest iteration the last iterative deepening search finished
+        self.pvTable = [[] for ply in range(MAX_DEPTH + 2)] #pvTable[ply] is the best line found from the node being searched at ply, built up from pvTable[ply + 1]
+        self.principalVariation = [] #move codes of the line the last search expects, starting with its best move
+        self.killerMoves = [[0, 0] for ply in range(MAX_DEPTH + 1)] #the last two quiet moves at each ply that caused a cutoff, most recent first
+        self.historyTable = [0] * 4096 #how much each quiet move (indexed by start square + end square * 64) has caused cutoffs, weighted by depth
+        self.nodes = 0 #positions searched (including the quiescence search) since the last search started
+        self.qnodes = 0 #of those, the ones searched by the quiescence search
+        self.selDepth = 0 #deepest ply the search has reached, including the quiescence search
+        self.score = 0 #score of the best move for the side to move, from the last search that finished
+        self.cutoffs = 0 #beta cutoffs in the negamax alpha beta search
+        self.firstMoveCutoffs = 0 #beta cutoffs caused by the first move searched
+        self.searchStart = 0 #time.perf_counter() when the search started
+        self.iterationNodes = [0] #nodes searched by the end of each iteration of iterative deepening that finished
+        self.stats = {} #statistics of the last search, from getSearchStats
+        self.infoCallback = None #if set, called with getSearchStats() after each iteration of iterative deepening, e.g. lambda stats: print(formatInfo(stats))
+        self.profileTime = False #True to split the search time between move generation, make/undo and move ordering, which makes the search slower
+        self.searchTimes = {} #seconds spent on each part of the search when profileTime is set
+        self.timing = False #True while a profiled call is being timed, so the calls it makes aren't timed twice
+
+    """
+    Sets the strength to one of DIFFICULTY_LEVELS: a node budget for each move and a margin for picking near-equal root moves at random
+    """
+    def setDifficulty(self, difficulty):
+        self.nodeLimit, self.randomMargin = DIFFICULTY_LEVELS[difficulty]
+
+    """
+    Gives each root move a random bonus below randomMargin for this search, so any move that close to the best can come out on top.
+    The bonus stays the same for every iteration, so the move picked doesn't flip between iterations
+    """
+    def setRootBonus(self, validMoves):
+        self.rootBonus = {move: self.random.randrange(self.randomMargin) for move in validMoves} if self.randomMargin > 0 else None
+
+    """
+    Makes the search running in another thread give up as soon as possible. It still returns the best move it had found
+    """
+    def stop(self):
+        self.stopSearch = True
+
+    """
+    Forgets everything learnt from earlier games: the transposition table and the move ordering tables
+    """
+    def newGame(self):
+        self.transpositionTable.clear()
+        for killers in self.killerMoves:
+            killers[0] = killers[1] = 0
+        for i in range(len(self.historyTable)):
+            self.historyTable[i] = 0
+        self.principalVariation = []
+
+    """
+    Gets ready for a new search of gs from the root to depth, with timeLimit seconds or no time limit if it is None
+    """
+    def startSearch(self, gs, depth, timeLimit = None):
+        self.transpositionTable.newSearch()
+        self.resetMoveOrdering()
+        self.rootDepth = depth
+        self.rootInCheck = gs.inCheck #set when the root moves were generated
+        self.searchStart = time.perf_counter()
+        self.searchDeadline = None if timeLimit is None else self.searchStart + timeLimit
+        self.stopSearch = False
+        self.nextMove = None
+        self.rootBonus = None
+        self.qnodes = self.selDepth = self.completedDepth = 0
+        self.iterationNodes = [0]
+        if self.profileTime:
+            self.startProfile(gs)
+
+    """
+    Called at the end of each search, to save its statistics in self.stats
+    """
+    def finishSearch(self, gs):
+        if self.profileTime:
+            self.stopProfile(gs)
+        self.stats = self.getSearchStats()
+
+    """
+    Runs search(gs, validMoves) as a new search of gs to depth (self.depth if it is None), with timeLimit seconds or no time limit if it is None.
+    The moves are turned into move codes and shuffled with this searcher's own random numbers first, so a seeded search is repeatable.
+    search returns the best move code, which comes back as a Move object. finishSearch always runs, so the timed methods come off gs again even if the search raises
+    """
+    def runSearch(self, gs, validMoves, search, depth = None, timeLimit = None):
+        validMoves = [move.moveCode for move in validMoves] #search with move codes instead of Move objects
+        self.random.shuffle(validMoves)
+        self.startSearch(gs, self.depth if depth is None else depth, timeLimit)
+        try:
+            bestMove = search(gs, validMoves)
+        finally:
+            self.searchDeadline = None
+            self.finishSearch(gs)
+        return moveFromCode(gs, bestMove)
+
+    """
+    Records score as the result of a search that went all the way to rootDepth. Returns the best move code it found
+    """
+    def fixedDepth(self, score):
+        self.score = score
+        self.completedDepth = self.rootDepth
+        return self.nextMove
+
+    """
+    Times the gameState methods in PROFILED_METHODS and the move ordering, by covering them with timed versions for this search only.
+    Nothing is covered when profileTime is off, so the statistics cost nothing but the counters
+    """
+    def startProfile(self, gs):
+        self.searchTimes = {"moveGeneration": 0, "makeUndo": 0, "moveOrdering": 0}
+        self.timing = False
+        for name, category in PROFILED_METHODS:
+            setattr(gs, name, self.timed(getattr(gs, name), category))
+        self.orderMoves = self.timed(self.orderMoves, "moveOrdering")
+
+    """
+    Takes the timed versions away again, so gs and the searcher go back to their own methods
+    """
+    def stopProfile(self, gs):
+        for name, category in PROFILED_METHODS:
+            if name in gs.__dict__:
+                delattr(gs, name)
+        if "orderMoves" in self.__dict__:
+            del self.orderMoves
+
+    """
+    Returns a version of function that adds the time it takes to searchTimes[category].
+    None of the timed methods calls another (the legal move generator uses pins and check masks, it doesn't make and undo moves), but a call made while another is being timed counts towards the outer one so no time is counted twice
+    """
+    def timed(self, function, category):
+        times = self.searchTimes
+        def timedFunction(*args):
+            if self.timing:
+                return function(*args)
+            self.timing = True
+            start = time.perf_counter()
+            try:
+                return function(*args)
+            finally:
+                times[category] += time.perf_counter() - start
+                self.timing = False
+        return timedFunction
+
+    """
+    Returns the statistics of the search so far as a dictionary: the depth finished and deepest ply reached, nodes and quiescence nodes, time and nodes per second,
+    the effective branching factor (how many times more nodes the last iteration took than the one before, or the depth-th root of the nodes for a fixed depth search),
+    the cutoff counters, transposition table probes, hits and collisions, the score and the principal variation, and the time split when profileTime is set
+    """
+    def getSearchStats(self):
+        elapsed = time.perf_counter() - self.searchStart
+        iterations = self.iterationNodes
+        if len(iterations) >= 3 and iterations[-2] > iterations[-3]:
+            branchingFactor = (iterations[-1] - iterations[-2]) / (iterations[-2] - iterations[-3])
+        elif self.completedDepth > 0:
+            branchingFactor = self.nodes ** (1 / self.completedDepth)
+        else:
+            branchingFactor = 0
+        ttStats = self.transpositionTable.getStats() #newSearch starts the table's counters again for each search
+        stats = {"depth": self.completedDepth, "selDepth": self.selDepth, "nodes": self.nodes, "qnodes": self.qnodes,
+                 "time": elapsed, "nps": int(self.nodes / elapsed) if elapsed > 0 else 0, "branchingFactor": branchingFactor,
+                 "cutoffs": self.cutoffs, "firstMoveCutoffs": self.firstMoveCutoffs, "firstMoveCutoffRate": self.firstMoveCutoffs / self.cutoffs if self.cutoffs else 0,
+                 "ttProbes": ttStats["probes"], "ttHits": ttStats["hits"], "ttHitRate": ttStats["hitRate"], "ttCollisions": ttStats["collisions"],
+                 "score": self.score, "pv": list(self.principalVariation)}
+        if self.profileTime:
+            for category, seconds in self.searchTimes.items():
+                stats[category + "Time"] = seconds
+            stats["otherTime"] = elapsed - sum(self.searchTimes.values()) #the search itself: transposition table, scoring, pruning decisions
+        return stats
+
+    """
+    Sorts the moves so the ones most likely to be best are searched first
+    """
+    def orderMoves(self, gs, moves, ply, hashMove = 0):
+        board = gs.board
+        killer1, killer2 = self.killerMoves[ply]
+        historyTable = self.historyTable
+        def moveScore(move):
+            if move == hashMove:
+                return HASH_MOVE_SCORE
+            endSq = (move >> 6) & 63
+            victim = board[endSq >> 3][endSq & 7]
+            if victim != "--" or move & (chessEngine.EN_PASSANT_FLAG | chessEngine.PROMOTION_MASK): #capture or promotion
+                startSq = move & 63
+                victimValue = PIECE_VALUES[victim] if victim != "--" else PIECE_VALUES["wP"] if move & chessEngine.EN_PASSANT_FLAG else 0
+                victimValue += PROMOTION_VALUES[(move & chessEngine.PROMOTION_MASK) >> chessEngine.PROMOTION_SHIFT]
+                return CAPTURE_SCORE + victimValue * 16 - PIECE_VALUES[board[startSq >> 3][startSq & 7]]
+            if move == killer1:
+                return KILLER_SCORES[0]
+            if move == killer2:
+                return KILLER_SCORES[1]
+            return historyTable[move & 4095]
+        moves.sort(key = moveScore, reverse = True) #stable, so moves with the same score keep their order
+
+    """
+    Remembers a quiet move that caused a beta cutoff as a killer move for this ply and adds to its history score
+    """
+    def updateMoveOrdering(self, gs, move, ply, depth):
+        endSq = (move >> 6) & 63
+        if gs.board[endSq >> 3][endSq & 7] != "--" or move & (chessEngine.EN_PASSANT_FLAG | chessEngine.PROMOTION_MASK): #captures are already ordered by MVV-LVA
+            return
+        killers = self.killerMoves[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        self.historyTable[move & 4095] += depth * depth #cutoffs near the root are worth more
+
+    """
+    Called at the start of each search. Clears the killer moves, node count and cutoff counters and halves the history scores, so older results count for less
+    """
+    def resetMoveOrdering(self):
+        for killers in self.killerMoves:
+            killers[0] = killers[1] = 0
+        historyTable = self.historyTable
+        for i in range(len(historyTable)):
+            historyTable[i] >>= 1
+        self.cutoffs = self.firstMoveCutoffs = self.nodes = 0
+
+    """
+    Returns the cutoff counters as a dictionary. A high first move cutoff rate means the move ordering is working
+    """
+    def getMoveOrderingStats(self):
+        return {"cutoffs": self.cutoffs, "firstMoveCutoffs": self.firstMoveCutoffs, "firstMoveCutoffRate": self.firstMoveCutoffs / self.cutoffs if self.cutoffs else 0}
+
+    """
+    Returns True once the search should stop, either because stop was called, the time is up or the node budget is used up
+    """
+    def searchStopped(self):
+        if not self.stopSearch:
+            if self.searchDeadline is not None and time.perf_counter() >= self.searchDeadline:
+                self.stopSearch = True
+            elif self.nodeLimit is not None and self.nodes >= self.nodeLimit:
+                self.stopSearch = True
+        return self.stopSearch
+
+    """
+    Helper function to make first recursive call. Returns the best move as a Move object
+    """
+    def findBestMoveMinMax(self, gs, validMoves, depth = None):
+        return self.runSearch(gs, validMoves, lambda gs, validMoves: self.fixedDepth((1 if gs.whiteToMove else -1) * self.findMoveMinMax(gs, validMoves, self.rootDepth, gs.whiteToMove)), depth) #minmax scores are from white's side
+
+    """
+    Finds the best move on the board recursively (minmax algorithm)
+    """
+    def findMoveMinMax(self, gs, validMoves, depth, whiteToMove):
+        self.nodes += 1
+        if depth == 0: #terminal node
+            return scoreBoard(gs) #score the board
+
+        if whiteToMove: #white's turn
+            maxScore = -CHECKMATE #set max score
+            for move in validMoves: #loop through valid moves
+                gs.makeMove(move) #make the move
+                nextMoves = gs.getValidMoveCodes() #get the next moves
+                score = self.findMoveMinMax(gs, nextMoves, depth-1, False) #recursive function call
+                if score > maxScore: #higher score?
+                    maxScore = score #set new max score
+                    if depth == self.rootDepth: #if depth is equal to max depth
+                        self.nextMove = move #set new next move
+                gs.undoMove() #undo the move
+            return maxScore #return the max score
+
+        else: #black's turn
+            minScore = CHECKMATE #set min score
+            for move in validMoves: #loop through valid moves
+                gs.makeMove(move) #make the move
+                nextMoves = gs.getValidMoveCodes() #get the next moves
+                score = self.findMoveMinMax(gs, nextMoves, depth-1, True) #recursive function call
+                if score < minScore: #lower score?
+                    minScore = score #set new min score
+                    if depth == self.rootDepth: #if depth is equal to max depth
+                        self.nextMove = move #set new next move
+                gs.undoMove() #undo the move
+            return minScore #return the max score
+
+    """
+    Helper function to make first recursive call with alpha beta pruning. Returns the best move as a Move object
+    """
+    def findBestMoveMinMaxAlphaBeta(self, gs, validMoves, depth = None):
+        return self.runSearch(gs, validMoves, lambda gs, validMoves: self.fixedDepth((1 if gs.whiteToMove else -1) * self.findMoveMinMaxAlphaBeta(gs, validMoves, self.rootDepth, -CHECKMATE, CHECKMATE, gs.whiteToMove)), depth) #minmax scores are from white's side
+
+    """
+    Finds the best move on the board recursively with alpha beta pruning (minmax algorithm)
+    """
+    def findMoveMinMaxAlphaBeta(self, gs, validMoves, depth, alpha, beta, whiteToMove):
+        self.nodes += 1
+        if depth == 0: #terminal node
+            return scoreBoard(gs) #score the board
+
+        if whiteToMove: #white's turn
+            maxScore = -CHECKMATE #set max score
+            for move in validMoves: #loop through valid moves
+                gs.makeMove(move) #make the move
+                nextMoves = gs.getValidMoveCodes() #get the next moves
+                score = self.findMoveMinMaxAlphaBeta(gs, nextMoves, depth-1, alpha, beta, False) #recursive function call
+                if score > maxScore: #higher score?
+                    maxScore = score #set new max score
+                    if depth == self.rootDepth: #if depth is equal to max depth
+                        self.nextMove = move #set new next move
+                gs.undoMove() #undo the move
+                if maxScore > beta: #pruning
+                    break
+                if maxScore > alpha:
+                    alpha = maxScore
+            return maxScore #return the max score
+
+        else: #black's turn
+            minScore = CHECKMATE #set min score
+            for move in validMoves: #loop through valid moves
+                gs.makeMove(move) #make the move
+                nextMoves = gs.getValidMoveCodes() #get the next moves
+                score = self.findMoveMinMaxAlphaBeta(gs, nextMoves, depth-1, alpha, beta, True) #recursive function call
+                if score < minScore: #lower score?
+                    minScore = score #set new min score
+                    if depth == self.rootDepth: #if depth is equal to max depth
+                        self.nextMove = move #set new next move
+                gs.undoMove() #undo the move
+                if minScore < alpha: #pruning
+                    break
+                if minScore < beta:
+                    beta = minScore
+            return minScore #return the max score
+
+    """
+    Helper function to make first recursive call (negamax algorithm). Returns the best move as a Move object
+    """
+    def findBestMoveNegaMax(self, gs, validMoves, depth = None):
+        return self.runSearch(gs, validMoves, lambda gs, validMoves: self.fixedDepth(self.findMoveNegaMax(gs, validMoves, self.rootDepth, 1 if gs.whiteToMove else -1)), depth)
+
+    """
+    Finds the best move on the board recursively (negamax algorithm)
+    """
+    def findMoveNegaMax(self, gs, validMoves, depth, turnMultiplier):
+        self.nodes += 1
+        if depth == 0: #terminal node
+            return turnMultiplier * scoreBoard(gs) #score the board
+
+        maxScore = -CHECKMATE #set max score
+        for move in validMoves: #loop through valid moves
+            gs.makeMove(move) #make the move
+            nextMoves = gs.getValidMoveCodes() #get the next moves
+            score = -self.findMoveNegaMax(gs, nextMoves, depth-1, -turnMultiplier) #must be * -1 because we are looking at opponent's moves
+            if score > maxScore: #higher score?
+                maxScore = score #set new max score
+                if depth == self.rootDepth: #if depth is equal to max depth
+                    self.nextMove = move #set new next move
+            gs.undoMove() #undo the move
+        return maxScore
+
+    """
+    Helper function to make first recursive call with alpha beta pruning (negamax algorithm). Returns the best move as a Move object
+    """
+    def findBestMoveNegaMaxAlphaBeta(self, gs, validMoves, depth = None):
+        return self.runSearch(gs, validMoves, lambda gs, validMoves: self.fixedDepth(self.findMoveNegaMaxAlphaBeta(gs, validMoves, self.rootDepth, -CHECKMATE, CHECKMATE, 1 if gs.whiteToMove else -1)), depth)
+
+    """
+    Root split - each root move is searched by a separate process from a pool, to the same depth as findBestMoveNegaMaxAlphaBeta.
+    The processes get the position as a FEN string and the move as a move code instead of a pickled gameState.
+    Whenever a process finishes a move that beats the best score so far it raises rootBound, and moves started after that are searched with it as alpha.
+    The pool is made the first time and kept while the number of workers stays the same, so its processes keep their transposition tables between moves and games.
+    The pool is shared by every Searcher in the process, so only one root split search can run at a time.
+    """
+    def findBestMoveRootSplit(self, gs, validMoves, depth = None, workers = None):
+        return self.runSearch(gs, validMoves, lambda gs, validMoves: self.rootSplit(gs, validMoves, workers), depth)
+
+    """
+    Hands each root move to the root split pool, searched to rootDepth by workers processes, and collects the results. Returns the best move code
+    """
+    def rootSplit(self, gs, validMoves, workers):
+        global rootSearchId
+        entry = self.transpositionTable.probe(gs.zobristKey)
+        self.orderMoves(gs, validMoves, 0, entry[3] if entry is not None else 0) #likely best moves go first, so the bound is raised early
+        pool = getSearchPool(workers)
+        rootBound.value = -CHECKMATE
+        rootSearchId += 1
+        fen = gs.toFEN()
+        futures = [pool.submit(searchRootMove, fen, move, self.rootDepth, rootSearchId) for move in validMoves]
+        bestMove = None
+        maxScore = -CHECKMATE - 1
+        for future in futures: #in the order the moves were given, so equal scores go to the move ordered first
+            move, score, moveNodes, moveQNodes = future.result()
+            self.nodes += moveNodes
+            self.qnodes += moveQNodes
+            if score > maxScore:
+                maxScore = score
+                bestMove = move
+        self.score = maxScore
+        self.completedDepth = self.rootDepth
+        return bestMove
+
+    """
+    Iterative deepening - searches to depth 1, then 2, then 3 and so on until the time limit runs out or stop is called.
+    Returns the best move from the last search that finished, so how long a move takes is predictable instead of how deep it goes.
+    Each search puts the best moves from the one before first through the transposition table, so the early shallow searches cost very little.
+    Each iteration uses the principal variation search, starting with a narrow aspiration window around the score of the one before and widening it if the score falls outside.
+    The line it expects is left in principalVariation.
+    depthOffset skips the first iterations, so Lazy SMP helpers sharing a transposition table aren't all searching the same depth.
+    With a node budget and no timeLimit the budget alone decides when it stops, so the move doesn't depend on how fast the computer is.
+    With remainingTime (seconds left on the clock) and no timeLimit, the time for this move comes from allocateTime with the clock's increment.
+    """
+    def findBestMoveIterativeDeepening(self, gs, validMoves, timeLimit = None, maxDepth = MAX_DEPTH, depthOffset = 0, remainingTime = None, increment = 0):
+        if timeLimit is None and remainingTime is not None:
+            timeLimit = allocateTime(remainingTime, increment)
+        elif timeLimit is None:
+            timeLimit = TIME_LIMIT if self.nodeLimit is None else float("inf")
+        return self.runSearch(gs, validMoves, lambda gs, validMoves: self.iterativeDeepening(gs, validMoves, maxDepth, depthOffset), 1 + depthOffset, timeLimit)
+
+    """
+    The iterations of findBestMoveIterativeDeepening, from rootDepth up to maxDepth. Returns the best move code
+    """
+    def iterativeDeepening(self, gs, validMoves, maxDepth, depthOffset):
+        self.setRootBonus(validMoves)
+        bestMove = None
+        self.principalVariation = []
+        score = None
+        for depth in range(1 + depthOffset, maxDepth + 1):
+            self.rootDepth = depth
+            alpha, beta = -CHECKMATE, CHECKMATE
+            if score is not None and abs(score) < MATE_THRESHOLD: #aspiration window around the last iteration's score
+                alpha, beta = score - ASPIRATION_WINDOW, score + ASPIRATION_WINDOW
+            while True:
+                self.nextMove = None
+                score = self.findMovePrincipalVariation(gs, validMoves, self.rootInCheck, depth, alpha, beta, 1 if gs.whiteToMove else -1)
+                if self.stopSearch:
+                    break
+                if score <= alpha and alpha > -CHECKMATE: #failed low, the real score is lower so search again with no lower limit
+                    alpha = -CHECKMATE
+                elif score >= beta and beta < CHECKMATE: #failed high
+                    beta = CHECKMATE
+                else:
+                    break
+            if self.stopSearch: #this search didn't finish, so its result can't be trusted
+                if bestMove is None: #not even the first search finished, use the best move it had found so far
+                    bestMove = self.nextMove
+                    if bestMove is None and validMoves: #not even one root move finished (a small node budget), so take the move ordered first
+                        bestMove = validMoves[0]
+                    self.principalVariation = [bestMove] if bestMove is not None else []
+                break
+            bestMove = self.nextMove
+            self.principalVariation = self.pvTable[0]
+            self.completedDepth = depth
+            self.score = score
+            self.iterationNodes.append(self.nodes)
+            if self.infoCallback is not None:
+                self.infoCallback(self.getSearchStats())
+            if len(validMoves) == 1 or abs(score) >= MATE_THRESHOLD: #only one move, or a forced checkmate has been found (the shortest, since every shorter line was searched first)
+                break
+        return bestMove
+
+    """
+    Returns the reply the last search expects to move, from the principal variation or else the transposition table, or None if it doesn't have a legal one
+    """
+    def getPonderMove(self, gs, moveCode):
+        if len(self.principalVariation) > 1 and self.principalVariation[0] == moveCode:
+            return self.principalVariation[1]
+        gs.makeMove(moveCode)
+        entry = self.transpositionTable.probe(gs.zobristKey)
+        ponderMove = None
+        if entry is not None and entry[3] in gs.getValidMoveCodes(): #stored moves could be from a different position with the same key
+            ponderMove = entry[3]
+        gs.undoMove()
+        return ponderMove
+
+    """
+    Returns the principal variation of the last search as Move objects, for showing the line the AI expects
+    """
+    def getPrincipalVariation(self, gs):
+        moves = []
+        for moveCode in self.principalVariation:
+            moves.append(moveFromCode(gs, moveCode))
+            gs.makeMove(moveCode)
+        for moveCode in self.principalVariation:
+            gs.undoMove()
+        return moves
+
+    """
+    Principal variation search (NegaScout) - negamax alpha beta that searches the first move with the full window and every other move with a null window,
+    which only proves the move is no better than the first. Only a move that turns out better is searched again with the full window.
+    With good move ordering the first move is nearly always best, so most moves are proven worse with a cheap null window search.
+    The transposition table only cuts off null window searches, so the principal variation in pvTable is never cut short.
+    Null move pruning: in a null window search, if the side to move could pass and a shallower search still fails high, a real move would too, so the node is cut off.
+    Late move reductions: quiet moves late in the ordering are searched less deep, and only searched again at full depth if they turn out better than alpha.
+    At the root each move's rootBonus is added to its score, by searching it with a window that much lower.
+    inCheck is gs.inCheck as it was when validMoves were generated. A re-search gets the same moves after deeper searches have changed gs.inCheck, so the caller saves it.
+    """
+    def findMovePrincipalVariation(self, gs, validMoves, inCheck, depth, alpha, beta, turnMultiplier, ply = 0):
+        self.nodes += 1
+        self.pvTable[ply] = []
+        if self.searchStopped(): #out of time, the result will be thrown away
+            return 0
+        if not validMoves: #game is over, checkmate if in check and stalemate if not
+            return -(CHECKMATE - ply) if inCheck else STALEMATE
+        if depth == 0: #terminal node
+            return self.quiescenceSearch(gs, alpha, beta, turnMultiplier, ply) #keep searching captures so the score isn't taken in the middle of an exchange
+
+        #look the position up in the transposition table
+        alphaOriginal = alpha
+        hashMove = 0
+        entry = self.transpositionTable.probe(gs.zobristKey)
+        if entry is not None:
+            ttDepth, ttScore, ttBound, hashMove = entry
+            ttScore = scoreFromTable(ttScore, ply)
+            if ttDepth >= depth and beta - alpha == 1: #searched at least this deep already, and not part of the principal variation
+                if ttBound == chessTransposition.EXACT:
+                    return ttScore
+                elif ttBound == chessTransposition.LOWER:
+                    alpha = max(alpha, ttScore)
+                else:
+                    beta = min(beta, ttScore)
+                if alpha >= beta:
+                    return ttScore
+
+        #null move pruning
+        if self.useNullMove and beta - alpha == 1 and ply > 0 and depth >= NULL_MOVE_MIN_DEPTH and not inCheck and gs.nullMoveAllowed() and turnMultiplier * scorePosition(gs) >= beta:
+            gs.makeNullMove()
+            nextMoves = gs.getValidMoveCodes()
+            score = -self.findMovePrincipalVariation(gs, nextMoves, gs.inCheck, max(depth-1-NULL_MOVE_REDUCTION, 0), -beta, -beta+1, -turnMultiplier, ply+1)
+            gs.undoNullMove()
+            if self.stopSearch:
+                return 0
+            if score >= beta: #even passing is good enough
+                return beta if score >= MATE_THRESHOLD else score #a mate found after passing can't be trusted
+        self.orderMoves(gs, validMoves, ply, hashMove) #best move found last time goes first, it is the most likely to cause a cutoff
+
+        maxScore = -CHECKMATE - 1 #lower than any score, so a move is picked even when every move gets mated
+        bestMove = None
+        board = gs.board
+        killers = self.killerMoves[ply]
+        rootBonus = self.rootBonus if ply == 0 else None
+        bonus = 0
+        for i, move in enumerate(validMoves): #loop through valid moves
+            endSq = (move >> 6) & 63
+            quiet = board[endSq >> 3][endSq & 7] == "--" and not move & (chessEngine.EN_PASSANT_FLAG | chessEngine.PROMOTION_MASK)
+            if rootBonus is not None:
+                bonus = rootBonus[move]
+            gs.makeMove(move) #make the move
+            nextMoves = gs.getValidMoveCodes() #get the next moves
+            nextInCheck = gs.inCheck #saved for the re-searches, the first search changes gs.inCheck
+            if i == 0: #full window for the first move
+                score = bonus - self.findMovePrincipalVariation(gs, nextMoves, nextInCheck, depth-1, bonus-beta, bonus-alpha, -turnMultiplier, ply+1)
+            else:
+                reduction = 0
+                if self.useLMR and depth >= LMR_MIN_DEPTH and i >= LMR_MIN_MOVES and quiet and not inCheck and not nextInCheck and move != killers[0] and move != killers[1]:
+                    reduction = 1 if i < LMR_MIN_MOVES * 2 else min(2, depth - 2) #later moves are reduced more
+                score = bonus - self.findMovePrincipalVariation(gs, nextMoves, nextInCheck, depth-1-reduction, bonus-alpha-1, bonus-alpha, -turnMultiplier, ply+1) #null window, is this move better than alpha?
+                if reduction and score > alpha and not self.stopSearch: #better than expected, check it at full depth
+                    score = bonus - self.findMovePrincipalVariation(gs, nextMoves, nextInCheck, depth-1, bonus-alpha-1, bonus-alpha, -turnMultiplier, ply+1)
+                if alpha < score < beta and not self.stopSearch: #it is, so search again with the full window for its real score
+                    score = bonus - self.findMovePrincipalVariation(gs, nextMoves, nextInCheck, depth-1, bonus-beta, bonus-alpha, -turnMultiplier, ply+1)
+            gs.undoMove() #undo the move
+            if self.stopSearch: #gave up part way through, so this score can't be used and nothing is stored
+                return maxScore
+            if score > maxScore: #higher score?
+                maxScore = score #set new max score
+                bestMove = move
+                if depth == self.rootDepth: #if depth is equal to max depth
+                    self.nextMove = move #set new next move
+            if score > alpha:
+                alpha = score
+                self.pvTable[ply] = [move] + self.pvTable[ply + 1] #this move then the best line after it
+            if alpha >= beta:
+                self.cutoffs += 1
+                if i == 0:
+                    self.firstMoveCutoffs += 1
+                self.updateMoveOrdering(gs, move, ply, depth)
+                break
+
+        #save the result so transpositions of this position don't have to be searched again
+        if maxScore <= alphaOriginal: #nothing beat alpha, so the real score could be lower
+            bound = chessTransposition.UPPER
+        elif maxScore >= beta: #cut off, so the real score could be higher
+            bound = chessTransposition.LOWER
+        else:
+            bound = chessTransposition.EXACT
+        self.transpositionTable.store(gs.zobristKey, depth, scoreToTable(maxScore, ply), bound, bestMove) #at the root this includes the best move's rootBonus, so it is less than randomMargin too high
+        return maxScore
+
+    """
+    Helper function to make the first call to the principal variation search, to a fixed depth like findBestMoveNegaMaxAlphaBeta. Returns the best move as a Move object
+    """
+    def findBestMovePrincipalVariation(self, gs, validMoves, depth = None):
+        return self.runSearch(gs, validMoves, self.principalVariationSearch, depth)
+
+    """
+    Searches the root moves to rootDepth with the principal variation search and leaves the line it expects in principalVariation. Returns the best move code
+    """
+    def principalVariationSearch(self, gs, validMoves):
+        self.setRootBonus(validMoves)
+        score = self.findMovePrincipalVariation(gs, validMoves, self.rootInCheck, self.rootDepth, -CHECKMATE, CHECKMATE, 1 if gs.whiteToMove else -1)
+        self.principalVariation = self.pvTable[0]
+        return self.fixedDepth(score)
+
+    """
+    Finds the best move on the board recursively with alpha beta pruning (negamax algorithm)
+    """
+    def findMoveNegaMaxAlphaBeta(self, gs, validMoves, depth, alpha, beta, turnMultiplier):
+        self.nodes += 1
+        if self.searchStopped(): #out of time, the result will be thrown away
+            return 0
+        ply = self.rootDepth - depth
+        if not validMoves: #game is over, checkmate if in check (inCheck was set when these moves were generated) and stalemate if not
+            return -(CHECKMATE - ply) if gs.inCheck else STALEMATE
+        if depth == 0: #terminal node
+            return self.quiescenceSearch(gs, alpha, beta, turnMultiplier, ply) #keep searching captures so the score isn't taken in the middle of an exchange
+
+        #look the position up in the transposition table
+        alphaOriginal = alpha
+        hashMove = 0
+        entry = self.transpositionTable.probe(gs.zobristKey)
+        if entry is not None:
+            ttDepth, ttScore, ttBound, hashMove = entry
+            ttScore = scoreFromTable(ttScore, ply)
+            if ttDepth >= depth and depth != self.rootDepth: #searched at least this deep already (the root still has to pick nextMove)
+                if ttBound == chessTransposition.EXACT:
+                    return ttScore
+                elif ttBound == chessTransposition.LOWER:
+                    alpha = max(alpha, ttScore)
+                else:
+                    beta = min(beta, ttScore)
+                if alpha >= beta:
+                    return ttScore
+        self.orderMoves(gs, validMoves, ply, hashMove) #best move found last time goes first, it is the most likely to cause a cutoff
+
+        maxScore = -CHECKMATE - 1 #lower than any score, so a move is picked even when every move gets mated
+        bestMove = None
+        for i, move in enumerate(validMoves): #loop through valid moves
+            gs.makeMove(move) #make the move
+            nextMoves = gs.getValidMoveCodes() #get the next moves
+            score = -self.findMoveNegaMaxAlphaBeta(gs, nextMoves, depth-1, -beta, -alpha, -turnMultiplier) #must be * -1 because we are looking at opponent's moves
+            if self.stopSearch: #gave up part way through, so this score can't be used and nothing is stored
+                gs.undoMove()
+                return maxScore
+            if score > maxScore: #higher score?
+                maxScore = score #set new max score
+                bestMove = move
+                if depth == self.rootDepth: #if depth is equal to max depth
+                    self.nextMove = move #set new next move
+            gs.undoMove() #undo the move
+            if maxScore > alpha: #pruning
+                alpha = maxScore
+            if alpha >= beta:
+                self.cutoffs += 1
+                if i == 0:
+                    self.firstMoveCutoffs += 1
+                self.updateMoveOrdering(gs, move, ply, depth)
+                break
+
+        #save the result so transpositions of this position don't have to be searched again
+        if maxScore <= alphaOriginal: #nothing beat alpha, so the real score could be lower
+            bound = chessTransposition.UPPER
+        elif maxScore >= beta: #cut off, so the real score could be higher
+            bound = chessTransposition.LOWER
+        else:
+            bound = chessTransposition.EXACT
+        self.transpositionTable.store(gs.zobristKey, depth, scoreToTable(maxScore, ply), bound, bestMove)
+        return maxScore
+
+    """
+    Quiescence search - at the end of the main search only captures and promotions are searched, until the position is quiet.
+    The side to move can always "stand pat" and take the static score instead of capturing, unless it is in check, where every move out of check is searched.
+    Captures that couldn't raise the score to alpha even after winning the piece are skipped (delta pruning).
+    """
+    def quiescenceSearch(self, gs, alpha, beta, turnMultiplier, ply):
+        self.nodes += 1
+        self.qnodes += 1
+        if ply > self.selDepth:
+            self.selDepth = ply
+        if self.searchStopped(): #out of time, the result will be thrown away
+            return 0
+        moves = gs.getCaptureMoveCodes()
+        inCheck = gs.inCheck #set by getCaptureMoveCodes, saved since searching the replies changes it
+        if inCheck: #can't stand pat in check, every way out has to be looked at
+            moves = gs.getValidMoveCodes()
+            if len(moves) == 0: #checkmate
+                return -(CHECKMATE - ply)
+            standPat = maxScore = -CHECKMATE
+        else:
+            standPat = maxScore = turnMultiplier * scorePosition(gs) #score if the side to move doesn't capture anything
+            if standPat >= beta:
+                return standPat
+            if standPat > alpha:
+                alpha = standPat
+
+        self.orderMoves(gs, moves, MAX_DEPTH) #MVV-LVA, there are no killers this deep
+        board = gs.board
+        for move in moves:
+            if not inCheck and not move & chessEngine.PROMOTION_MASK: #delta pruning
+                endSq = (move >> 6) & 63
+                victim = board[endSq >> 3][endSq & 7]
+                victimValue = chessEngine.MATERIAL_SCORES[victim[1] if victim != "--" else "P"] #empty end square means en passant
+                if standPat + victimValue + DELTA_MARGIN < alpha:
+                    continue
+            gs.makeMove(move)
+            score = -self.quiescenceSearch(gs, -beta, -alpha, -turnMultiplier, ply+1)
+            gs.undoMove()
+            if self.stopSearch:
+                return maxScore
+            if score > maxScore:
+                maxScore = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return maxScore
+
+"""
+Creates a new gameState using the backend chosen by USE_BITBOARDS, in the starting position or the position given as a FEN string
+"""
+def newGameState(fen = chessEngine.STARTING_FEN):
+    if USE_BITBOARDS:
+        return chessBitboard.bitboardGameState(fen)
+    return chessEngine.gameState(fen)
+
+"""
+Turns a move code found by the search back into a Move object for the GUI (None stays None)
+"""
+def moveFromCode(gs, moveCode):
+    if moveCode is None:
+        return None
+    return chessEngine.Move.fromMoveCode(moveCode, gs.board)
 
 """
 Picks and returns a random move
@@ -89,7 +814,7 @@ def findGreedyMove(gs, validMoves):
         elif gs.stalemate:
             score = STALEMATE #set score if stalemate is found
         else:
-            score = turnMultiplier * scoreMaterial(gs.board) #score the board
+            score = turnMultiplier * scoreMaterial(gs) #score the board
         if score > maxScore: #if score is better
             maxScore = score #new max score
             greedyMove = playerMove #new best move
@@ -108,7 +833,7 @@ def findBestMove(gs, validMoves):
     
     for playerMove in validMoves: #for every valid move
         gs.makeMove(playerMove) #make the move
-        opponentMoves = gs.getValidMoves() #get opponents moves
+        opponentMoves = gs.getValidMoveCodes() #get opponents moves
         #find opponentMaxScore
         if gs.stalemate:
             opponentMaxScore = STALEMATE
@@ -118,7 +843,7 @@ def findBestMove(gs, validMoves):
             opponentMaxScore = -CHECKMATE
             for opponentMove in opponentMoves: #look through opponents moves
                 gs.makeMove(opponentMove) #make the opponents move
-                gs.getValidMoves()
+                gs.getValidMoveCodes()
                 if gs.checkmate:
                     score = CHECKMATE #set score if checkmate is found
                 elif gs.stalemate:
@@ -134,165 +859,193 @@ def findBestMove(gs, validMoves):
         gs.undoMove() #undo the move
     return bestPlayerMove
 
+defaultSearcher = Searcher() #the searcher the findBestMove* functions below use
+
 """
 Helper function to make first recursive call
 """
 def findBestMoveMinMax(gs, validMoves, returnQueue):
-    global nextMove
-    nextMove = None #set nextMove to None
-    random.shuffle(validMoves) #shuffles valid moves
-    findMoveMinMax(gs, validMoves, DEPTH, gs.whiteToMove) #call minMax algorithm
-    returnQueue.put(nextMove) #add nextMove to the queue
+    returnQueue.put(defaultSearcher.findBestMoveMinMax(gs, validMoves, DEPTH)) #add nextMove to the queue
 
 """
-Finds the best move on the board recursively (minmax algorithm)
+Helper function to make first recursive call with alpha beta pruning
 """
-def findMoveMinMax(gs, validMoves, depth, whiteToMove):
-    global nextMove
-    if depth == 0: #terminal node
-        return scoreBoard(gs) #score the board
-    
-    if whiteToMove: #white's turn
-        maxScore = -CHECKMATE #set max score
-        for move in validMoves: #loop through valid moves
-            gs.makeMove(move) #make the move
-            nextMoves = gs.getValidMoves() #get the next moves
-            score = findMoveMinMax(gs, nextMoves, depth-1, False) #recursive function call
-            if score > maxScore: #higher score?
-                maxScore = score #set new max score
-                if depth == DEPTH: #if depth is equal to max depth
-                    nextMove = move #set new next move
-            gs.undoMove() #undo the move
-        return maxScore #return the max score
+def findBestMoveMinMaxAlphaBeta(gs, validMoves, returnQueue):
+    returnQueue.put(defaultSearcher.findBestMoveMinMaxAlphaBeta(gs, validMoves, DEPTH)) #add nextMove to the queue
 
-    else: #black's turn
-        minScore = CHECKMATE #set min score
-        for move in validMoves: #loop through valid moves
-            gs.makeMove(move) #make the move
-            nextMoves = gs.getValidMoves() #get the next moves
-            score = findMoveMinMax(gs, nextMoves, depth-1, True) #recursive function call
-            if score < minScore: #lower score?
-                minScore = score #set new min score
-                if depth == DEPTH: #if depth is equal to max depth
-                    nextMove = move #set new next move
-            gs.undoMove() #undo the move
-        return minScore #return the max score
+"""
+Helper function to make first recursive call
+"""
+def findBestMoveNegaMax(gs, validMoves, returnQueue):
+    returnQueue.put(defaultSearcher.findBestMoveNegaMax(gs, validMoves, DEPTH)) #add nextMove to the queue
 
 """
-Helper function to make first recursive call with alpha beta pruning
+Helper function to make first recursive call with alpha beta pruning (negamax algorithm)
 """
-def findBestMoveMinMaxAlphaBeta(gs, validMoves, returnQueue):
-    global nextMove
-    nextMove = None #set nextMove to None
-    random.shuffle(validMoves) #shuffles valid moves
-    findMoveMinMaxAlphaBeta(gs, validMoves, DEPTH, -CHECKMATE, CHECKMATE, gs.whiteToMove) #call minMax algorithm
-    returnQueue.put(nextMove) #add nextMove to the queue
+def findBestMoveNegaMaxAlphaBeta(gs, validMoves, returnQueue):
+    returnQueue.put(defaultSearcher.findBestMoveNegaMaxAlphaBeta(gs, validMoves, DEPTH)) #add nextMove to the queue
 
 """
-Finds the best move on the board recursively with alpha beta pruning (minmax algorithm)
+Root split search of Searcher.findBestMoveRootSplit, to DEPTH unless depth is given
 """
-def findMoveMinMaxAlphaBeta(gs, validMoves, depth, alpha, beta, whiteToMove):
-    global nextMove
-    if depth == 0: #terminal node
-        return scoreBoard(gs) #score the board
+def findBestMoveRootSplit(gs, validMoves, returnQueue, depth = None, workers = None):
+    returnQueue.put(defaultSearcher.findBestMoveRootSplit(gs, validMoves, DEPTH if depth is None else depth, workers)) #add the best move to the queue
 
-    if whiteToMove: #white's turn
-        maxScore = -CHECKMATE #set max score
-        for move in validMoves: #loop through valid moves
-            gs.makeMove(move) #make the move
-            nextMoves = gs.getValidMoves() #get the next moves
-            score = findMoveMinMaxAlphaBeta(gs, nextMoves, depth-1, alpha, beta, False) #recursive function call
-            if score > maxScore: #higher score?
-                maxScore = score #set new max score
-                if depth == DEPTH: #if depth is equal to max depth
-                    nextMove = move #set new next move
-            gs.undoMove() #undo the move
-            if maxScore > beta: #pruning
-                break
-            if maxScore > alpha:
-                alpha = maxScore
-        return maxScore #return the max score
+"""
+Iterative deepening search of Searcher.findBestMoveIterativeDeepening, for timeLimit seconds, a share of remainingTime if it is None, or TIME_LIMIT if both are None
+"""
+def findBestMoveIterativeDeepening(gs, validMoves, returnQueue, timeLimit = None, maxDepth = MAX_DEPTH, depthOffset = 0, remainingTime = None, increment = 0):
+    returnQueue.put(defaultSearcher.findBestMoveIterativeDeepening(gs, validMoves, timeLimit, maxDepth, depthOffset, remainingTime, increment)) #add the best move to the queue
 
-    else: #black's turn
-        minScore = CHECKMATE #set min score
-        for move in validMoves: #loop through valid moves
-            gs.makeMove(move) #make the move
-            nextMoves = gs.getValidMoves() #get the next moves
-            score = findMoveMinMaxAlphaBeta(gs, nextMoves, depth-1, alpha, beta, True) #recursive function call
-            if score < minScore: #lower score?
-                minScore = score #set new min score
-                if depth == DEPTH: #if depth is equal to max depth
-                    nextMove = move #set new next move
-            gs.undoMove() #undo the move
-            if minScore < alpha: #pruning
-                break
-            if minScore < beta:
-                beta = minScore
-        return minScore #return the max score
+"""
+Helper function to make the first call to the principal variation search, to a fixed depth like findBestMoveNegaMaxAlphaBeta
+"""
+def findBestMovePrincipalVariation(gs, validMoves, returnQueue):
+    returnQueue.put(defaultSearcher.findBestMovePrincipalVariation(gs, validMoves, DEPTH)) #add nextMove to the queue
 
 """
-Helper function to make first recursive call
+Returns the reply the last search with defaultSearcher expects to move
 """
-def findBestMoveNegaMax(gs, validMoves, returnQueue):
-    global nextMove
-    nextMove = None #set nextMove to None
-    random.shuffle(validMoves) #shuffles valid moves
-    findMoveNegaMax(gs, validMoves, DEPTH, 1 if gs.whiteToMove else -1) #call negaMax algorithm
-    returnQueue.put(nextMove) #add nextMove to the queue
+def getPonderMove(gs, moveCode):
+    return defaultSearcher.getPonderMove(gs, moveCode)
 
 """
-Finds the best move on the board recursively (negamax algorithm)
+Returns the principal variation of the last search with defaultSearcher as Move objects
 """
-def findMoveNegaMax(gs, validMoves, depth, turnMultiplier):
-    global nextMove
-    if depth == 0: #terminal node
-        return turnMultiplier * scoreBoard(gs) #score the board
-    
-    maxScore = -CHECKMATE #set max score
-    for move in validMoves: #loop through valid moves
-        gs.makeMove(move) #make the move
-        nextMoves = gs.getValidMoves() #get the next moves
-        score = -findMoveNegaMax(gs, nextMoves, depth-1, -turnMultiplier) #must be * -1 because we are looking at opponent's moves
-        if score > maxScore: #higher score?
-            maxScore = score #set new max score
-            if depth == DEPTH: #if depth is equal to max depth
-                nextMove = move #set new next move
-        gs.undoMove() #undo the move
-    return maxScore
+def getPrincipalVariation(gs):
+    return defaultSearcher.getPrincipalVariation(gs)
 
 """
-Helper function to make first recursive call with alpha beta pruning (negamax algorithm)
+Returns the statistics of the last search with defaultSearcher, see Searcher.getSearchStats
 """
-def findBestMoveNegaMaxAlphaBeta(gs, validMoves, returnQueue):
-    global nextMove
-    nextMove = None #set nextMove to None
-    random.shuffle(validMoves) #shuffles valid moves
-    findMoveNegaMaxAlphaBeta(gs, validMoves, DEPTH, -CHECKMATE, CHECKMATE, 1 if gs.whiteToMove else -1) #call minMax algorithm
-    returnQueue.put(nextMove) #add nextMove to the queue
-
-"""
-Finds the best move on the board recursively with alpha beta pruning (negamax algorithm)
-"""
-def findMoveNegaMaxAlphaBeta(gs, validMoves, depth, alpha, beta, turnMultiplier):
-    global nextMove
-    if depth == 0: #terminal node
-        return turnMultiplier * scoreBoard(gs) #score the board
-
-    maxScore = -CHECKMATE #set max score
-    for move in validMoves: #loop through valid moves
-        gs.makeMove(move) #make the move
-        nextMoves = gs.getValidMoves() #get the next moves
-        score = -findMoveNegaMaxAlphaBeta(gs, nextMoves, depth-1, -beta, -alpha, -turnMultiplier) #must be * -1 because we are looking at opponent's moves
-        if score > maxScore: #higher score?
-            maxScore = score #set new max score
-            if depth == DEPTH: #if depth is equal to max depth
-                nextMove = move #set new next move
-        gs.undoMove() #undo the move
-        if maxScore > alpha: #pruning
-            alpha = maxScore
-        if alpha >= beta:
-            break
-    return maxScore
+def getSearchStats():
+    return defaultSearcher.stats
+
+"""
+Returns the cutoff counters of the last search with defaultSearcher as a dictionary
+"""
+def getMoveOrderingStats():
+    return defaultSearcher.getMoveOrderingStats()
+
+"""
+Returns the root split process pool, starting it the first time and again whenever a different number of workers is asked for.
+workers defaults to THREADS, or the number of cores if THREADS is 1
+"""
+def getSearchPool(workers = None):
+    global searchPool, searchPoolWorkers, rootBound
+    if workers is None:
+        workers = THREADS if THREADS > 1 else multiprocessing.cpu_count()
+    if searchPool is not None and workers != searchPoolWorkers:
+        shutdownSearchPool()
+    if searchPool is None:
+        rootBound = multiprocessing.Value("i", -CHECKMATE)
+        searchPool = ProcessPoolExecutor(max_workers = workers, initializer = setRootBound, initargs = (rootBound,))
+        searchPoolWorkers = workers
+    return searchPool
+
+"""
+Shuts the root split process pool down
+"""
+def shutdownSearchPool():
+    global searchPool
+    if searchPool is not None:
+        searchPool.shutdown()
+        searchPool = None
+
+"""
+Runs in each pool process when it starts, to share the root bound (which can't be sent with each task).
+A forked process starts with a copy of the main process's rootSearchId, which could match the first search it is given, so it is reset to an id no search has
+"""
+def setRootBound(bound):
+    global rootBound, rootSearchId
+    rootBound = bound
+    rootSearchId = -1
+
+"""
+Runs in a pool process. Searches one root move of the position given by fen to depth and returns (move, score, nodes, quiescence nodes).
+A score no higher than the root bound it was searched with only means the move isn't better than the best one
+"""
+def searchRootMove(fen, move, depth, searchId):
+    global poolGameState, poolSearcher, rootSearchId
+    if poolGameState is None:
+        poolGameState = newGameState(fen)
+        poolSearcher = Searcher()
+    else:
+        poolGameState.setFEN(fen)
+    searcher = poolSearcher
+    if searchId != rootSearchId: #first move of a new search in this process
+        rootSearchId = searchId
+        searcher.transpositionTable.newSearch()
+        searcher.resetMoveOrdering()
+    gs = poolGameState
+    turnMultiplier = 1 if gs.whiteToMove else -1
+    gs.makeMove(move)
+    nextMoves = gs.getValidMoveCodes()
+    searcher.rootDepth = depth #the search is rooted at the position before the move, so the position after it is ply 1 and mate scores match the single process search
+    searcher.searchDeadline = None
+    searcher.stopSearch = False
+    alpha = rootBound.value
+    nodes, qnodes = searcher.nodes, searcher.qnodes
+    score = -searcher.findMoveNegaMaxAlphaBeta(gs, nextMoves, depth - 1, -CHECKMATE, -alpha, -turnMultiplier)
+    with rootBound.get_lock():
+        if score > rootBound.value:
+            rootBound.value = score
+    return move, score, searcher.nodes - nodes, searcher.qnodes - qnodes
+
+"""
+Mate scores count the plies from the root of the search, so the transposition table stores them counted from the position instead, since the same position can be reached at a different ply
+"""
+def scoreToTable(score, ply):
+    if score >= MATE_THRESHOLD:
+        return score + ply
+    if score <= -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+"""
+Turns a score stored by scoreToTable back into one counted from the root, for a position found at ply
+"""
+def scoreFromTable(score, ply):
+    if score >= MATE_THRESHOLD:
+        return score - ply
+    if score <= -MATE_THRESHOLD:
+        return score + ply
+    return score
+
+"""
+Returns a move code in long algebraic notation, e.g. e2e4 or e7e8q
+"""
+def moveCodeNotation(moveCode):
+    startSq = moveCode & 63
+    endSq = (moveCode >> 6) & 63
+    promotion = chessEngine.PROMOTION_PIECES[(moveCode & chessEngine.PROMOTION_MASK) >> chessEngine.PROMOTION_SHIFT]
+    return (chessEngine.Move.colsToFiles[startSq & 7] + chessEngine.Move.rowsToRanks[startSq >> 3] +
+            chessEngine.Move.colsToFiles[endSq & 7] + chessEngine.Move.rowsToRanks[endSq >> 3] + promotion.lower())
+
+"""
+Turns the statistics from Searcher.getSearchStats into one info line, like the ones a UCI engine prints after each iteration
+"""
+def formatInfo(stats):
+    score = stats["score"]
+    if abs(score) >= MATE_THRESHOLD: #moves to mate, negative if the side to move is the one getting mated
+        score = "mate %d" % ((CHECKMATE - abs(score) + 1) // 2 * (1 if score > 0 else -1))
+    else:
+        score = "cp %d" % score
+    info = "info depth %d seldepth %d score %s nodes %d qnodes %d nps %d time %d ebf %.2f fmc %.0f%% tthits %.0f%% ttcollisions %d" % (
+        stats["depth"], stats["selDepth"], score, stats["nodes"], stats["qnodes"], stats["nps"], stats["time"] * 1000,
+        stats["branchingFactor"], stats["firstMoveCutoffRate"] * 100, stats["ttHitRate"] * 100, stats["ttCollisions"])
+    if "moveGenerationTime" in stats:
+        info += " movegen %.0f%% makeundo %.0f%% ordering %.0f%%" % tuple(stats[category] / stats["time"] * 100 if stats["time"] else 0
+                                                                         for category in ("moveGenerationTime", "makeUndoTime", "moveOrderingTime"))
+    if stats["pv"]:
+        info += " pv " + " ".join(moveCodeNotation(moveCode) for moveCode in stats["pv"])
+    return info
+
+"""
+Works out how long to think for from the time left on the clock: an even share of the moves still to play plus most of the increment, never more than half of what is left
+"""
+def allocateTime(remainingTime, increment = 0, movesToGo = 30):
+    return min(remainingTime / max(movesToGo, 1) + increment * 0.8, remainingTime / 2)
 
 """
 Score the board based on position and material
@@ -305,37 +1058,24 @@ def scoreBoard(gs):
             return CHECKMATE #white wins
     elif gs.stalemate:
         return STALEMATE
+    return scorePosition(gs)
 
-    score = 0
-    for row in range(len(gs.board)):
-        for col in range(len(gs.board[row])):
-            square = gs.board[row][col]
-            if square != "--": #if not empty
-                #score positionally
-                piecePositionScore = 0
-                if square[1] != "K": #if not king
-                    if square[1] == "P": #if pawn
-                        piecePositionScore = piecePositionScores[square][row][col] #returns position score
-                    else: #if other piece
-                        piecePositionScore = piecePositionScores[square[1]][row][col] #returns position score
-
-                if square[0] == "w": #if piece is white
-                    score += pieceScores[square[1]] + piecePositionScore * .1 #add to total score
-                elif square[0] == "b": #if piece is black
-                    score -= pieceScores[square[1]] + piecePositionScore * .1 #subtract from total score
-    
-    return score
+"""
+Score the pieces on the board by material and where they stand in centipawns, without checking for checkmate or stalemate.
+The gameState keeps this score up to date as moves are made, so it doesn't have to look at the pieces
+"""
+def scorePosition(gs):
+    return gs.evaluation
 
 """
 Score the board based on material
 """
-def scoreMaterial(board):
+def scoreMaterial(gs):
     score = 0
-    for row in board:
-        for square in row:
-            if square[0] == "w": #if piece is white
-                score += pieceScores[square[1]] #add to total score
-            elif square[0] == "b": #if piece is black
-                score -= pieceScores[square[1]] #subtract from total score
+    for piece, squares in gs.pieceSquares.items():
+        if piece[0] == "w": #if piece is white
+            score += pieceScores[piece[1]] * len(squares) #add to total score
+        else: #if piece is black
+            score -= pieceScores[piece[1]] * len(squares) #subtract from total score
     
-    return score
\ No newline at end of file
+    return score
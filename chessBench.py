@@ -0,0 +1,211 @@
+"""
+This module measures the search, the same way perft.py measures the move generators.
+It compares the search with null move pruning and late move reductions turned on and off, by the nodes needed for a fixed depth and by how many tactics it solves.
+Run it with:
+    python chessBench.py bench [depth] - total nodes, time, nodes per second and a node count signature for a fixed depth search of BENCH_POSITIONS
+    python chessBench.py features [depth] - nodes and time for a fixed depth search of the perft positions with each combination of features
+    python chessBench.py tactics [seconds] - how many of the tactical positions each combination solves in the time
+    python chessBench.py depth [depth] - how deep iterative deepening gets in the time the plain alpha beta search takes to reach depth
+    python chessBench.py budget [seconds] - how deep iterative deepening gets on BENCH_POSITIONS with the same time for each, by default the average time the plain alpha beta search takes to reach depth 3 on them
+    python chessBench.py info [seconds] - an info line for each iteration of iterative deepening on the perft positions, with where the time goes
+    python chessBench.py levels [seed] - the moves, nodes and time of each difficulty level on the perft positions, run twice to show a seeded run repeats exactly
+"""
+
+import sys
+import time
+import zlib
+import chessAI
+import perft
+
+"""
+Tactical positions from Win At Chess (WAC.001 to WAC.020) with the best move, in the notation of str(Move)
+"""
+TACTICS = (
+    ("2rr3k/pp3pp1/1nnqbN1p/3pN3/2pP4/2P3Q1/PPB4P/R4RK1 w - - 0 1", "Qg6"),
+    ("8/7p/5k2/5p2/p1p2P2/Pr1pPK2/1P1R3P/8 b - - 0 1", "Rxb2"),
+    ("5rk1/1ppb3p/p1pb4/6q1/3P1p1r/2P1R2P/PP1BQ1P1/5RKN w - - 0 1", "Rg3"),
+    ("r1bq2rk/pp3pbp/2p1p1pQ/7P/3P4/2PB1N2/PP3PPR/2KR4 w - - 0 1", "Qxh7"),
+    ("5k2/6pp/p1qN4/1p1p4/3P4/2PKP2Q/PP3r2/3R4 b - - 0 1", "Qc4"),
+    ("7k/p7/1R5K/6r1/6p1/6P1/8/8 w - - 0 1", "Rb7"),
+    ("rnbqkb1r/pppp1ppp/8/4P3/6n1/7P/PPPNPPP1/R1BQKBNR b KQkq - 0 1", "Ne3"),
+    ("r4q1k/p2bR1rp/2p2Q1N/5p2/5p2/2P5/PP3PPP/R5K1 w - - 0 1", "Rf7"),
+    ("3q1rk1/p4pp1/2pb3p/3p4/6Pr/1PNQ4/P1PB1PP1/4RRK1 b - - 0 1", "Bh2"),
+    ("2br2k1/2q3rn/p2NppQ1/2p1P3/Pp5R/4P3/1P3PPP/3R2K1 w - - 0 1", "Rxh7"),
+    ("r1b1kb1r/3q1ppp/pBp1pn2/8/Np3P2/5B2/PPP3PP/R2Q1RK1 w kq - 0 1", "Bxc6"),
+    ("4k1r1/2p3r1/1pR1p3/3pP2p/3P2qP/P4N2/1PQ4P/5R1K b - - 0 1", "Qxf3"),
+    ("5rk1/pp4p1/2n1p2p/2Npq3/2p5/6P1/P3P1BP/R4Q1K w - - 0 1", "Qxf8"),
+    ("r2rb1k1/pp1q1p1p/2n1p1p1/2bp4/5P2/PP1BPR1Q/1BPN2PP/R5K1 w - - 0 1", "Qxh7"),
+    ("1R6/1brk2p1/4p2p/p1P1Pp2/P7/6P1/1P4P1/2R3K1 w - - 0 1", "Rxb7"),
+    ("r4rk1/ppp2ppp/2n5/2bqp3/8/P2PB3/1PP1NPPP/R2Q1RK1 w - - 0 1", "Nc3"),
+    ("1k5r/pppbn1pp/4q1r1/1P3p2/2NPp3/1QP5/P4PPP/R1B1R1K1 w - - 0 1", "Ne5"),
+    ("R7/P4k2/8/8/8/8/r7/6K1 w - - 0 1", "Rh8"),
+    ("r1b2rk1/ppbn1ppp/4p3/1QP4q/3P4/N4N2/5PPP/R1B2RK1 w - - 0 1", "c6"),
+    ("r2qkb1r/1ppb1ppp/p7/4p3/P1Q1P3/2P5/5PPP/R1B2KNR b kq - 0 1", "Bb5"),
+)
+BENCH_POSITIONS = tuple(fen for fen, counts, testDepth in perft.POSITIONS.values()) + tuple(fen for fen, bestMove in TACTICS) + (
+    "r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3", #quiet opening
+    "6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1", #back rank mate in one
+    "8/5pk1/6p1/8/5P2/6P1/5K2/8 w - - 0 1", #pawn ending
+    "8/8/8/4k3/8/8/8/3QK3 w - - 0 1", #queen against a lone king
+) #positions the bench searches: the perft positions, the tactics and a few quieter ones and endings
+BENCH_DEPTH = 4 #depth the bench searches each position to
+FEATURES = (("none", False, False), ("null move", True, False), ("lmr", False, True), ("null move + lmr", True, True)) #name, useNullMove, useLMR
+searcher = chessAI.Searcher() #every test searches with this, so compareFeatures can switch its features
+
+"""
+Clears everything searcher learned and reseeds it, so the next position is searched the same whatever was searched before
+"""
+def resetSearcher():
+    searcher.newGame()
+    searcher.random.seed(0)
+
+"""
+Searches every position to a fixed depth with the principal variation search. Returns the total nodes and time in seconds
+"""
+def countNodes(fens, depth):
+    totalNodes = 0
+    start = time.perf_counter()
+    for fen in fens:
+        resetSearcher() #each position starts from nothing, so the order they are searched in doesn't matter
+        gs = chessAI.newGameState(fen)
+        searcher.findBestMovePrincipalVariation(gs, gs.getValidMoves(), depth)
+        totalNodes += searcher.nodes
+    return totalNodes, time.perf_counter() - start
+
+"""
+Searches every tactical position for timeLimit seconds. Returns the number it found the best move for
+"""
+def solveTactics(timeLimit):
+    solved = 0
+    for fen, bestMove in TACTICS:
+        resetSearcher()
+        gs = chessAI.newGameState(fen)
+        if str(searcher.findBestMoveIterativeDeepening(gs, gs.getValidMoves(), timeLimit)) == bestMove:
+            solved += 1
+    return solved
+
+"""
+Runs test (countNodes or solveTactics) with each combination of null move pruning and late move reductions, printing the results
+"""
+def compareFeatures(test, *args):
+    oldFlags = searcher.useNullMove, searcher.useLMR
+    for name, useNullMove, useLMR in FEATURES:
+        searcher.useNullMove, searcher.useLMR = useNullMove, useLMR
+        print(name, test(*args))
+    searcher.useNullMove, searcher.useLMR = oldFlags
+
+"""
+For each position, times the current plain alpha beta search (findBestMoveNegaMaxAlphaBeta) to depth, then runs iterative deepening for the same time and prints how deep it got.
+With timeLimit every position gets that many seconds instead, for example plainSearchTime's average. Prints the average depth reached at the end
+"""
+def depthForTime(fens, depth = 3, timeLimit = None):
+    depths = []
+    for fen in fens:
+        gs = chessAI.newGameState(fen)
+        positionTime = timeLimit
+        if positionTime is None:
+            resetSearcher()
+            start = time.perf_counter()
+            searcher.findBestMoveNegaMaxAlphaBeta(gs, gs.getValidMoves(), depth)
+            positionTime = time.perf_counter() - start
+        resetSearcher()
+        searcher.findBestMoveIterativeDeepening(gs, gs.getValidMoves(), positionTime)
+        depths.append(searcher.completedDepth)
+        print(fen, "depth", depth, "took", round(positionTime, 2), "seconds, iterative deepening reached depth", searcher.completedDepth)
+    print("average depth", round(sum(depths) / len(depths), 1))
+
+"""
+Returns the average time in seconds the plain alpha beta search (findBestMoveNegaMaxAlphaBeta) takes to search a position to depth, measured on this computer
+"""
+def plainSearchTime(fens, depth = 3):
+    totalTime = 0
+    for fen in fens:
+        resetSearcher()
+        gs = chessAI.newGameState(fen)
+        start = time.perf_counter()
+        searcher.findBestMoveNegaMaxAlphaBeta(gs, gs.getValidMoves(), depth)
+        totalTime += time.perf_counter() - start
+    return totalTime / len(fens)
+
+"""
+Runs iterative deepening on every position for timeLimit seconds, printing an info line after each iteration. With profileTime it also shows where the time went
+"""
+def showInfo(fens, timeLimit = 1.0, profileTime = True):
+    searcher.infoCallback = lambda stats: print(chessAI.formatInfo(stats))
+    searcher.profileTime = profileTime
+    for fen in fens:
+        print(fen)
+        resetSearcher()
+        gs = chessAI.newGameState(fen)
+        searcher.findBestMoveIterativeDeepening(gs, gs.getValidMoves(), timeLimit)
+    searcher.infoCallback = None
+    searcher.profileTime = False
+
+"""
+Finds a move in every position at one of chessAI.DIFFICULTY_LEVELS, with a new Searcher seeded with seed. Returns the moves, total nodes and time in seconds
+"""
+def playLevel(fens, difficulty, seed = 1):
+    levelSearcher = chessAI.Searcher(seed = seed)
+    levelSearcher.setDifficulty(difficulty)
+    moves = []
+    totalNodes = 0
+    start = time.perf_counter()
+    for fen in fens:
+        gs = chessAI.newGameState(fen)
+        moves.append(str(levelSearcher.findBestMoveIterativeDeepening(gs, gs.getValidMoves())))
+        totalNodes += levelSearcher.nodes
+    return moves, totalNodes, time.perf_counter() - start
+
+"""
+Plays every difficulty level twice with the same seed, printing the results and whether the second run matched the first
+"""
+def compareLevels(fens, seed = 1):
+    for difficulty in chessAI.DIFFICULTY_LEVELS:
+        moves, totalNodes, elapsed = playLevel(fens, difficulty, seed)
+        repeatMoves, repeatNodes, repeatElapsed = playLevel(fens, difficulty, seed)
+        print(difficulty, " ".join(moves), "nodes", totalNodes, "seconds", round(elapsed, 2), "repeatable", moves == repeatMoves and totalNodes == repeatNodes)
+
+"""
+Regression check for the search. Searches every position to depth with the principal variation search, each from a cleared searcher with the same seed,
+so the node counts only depend on what the search does. Prints the nodes for each position, then the total nodes, time and nodes per second,
+and a signature made from every position's node count. If the signature is the same after a change the search is doing exactly the same work and only the speed changed.
+Returns the total nodes, time in seconds and signature
+"""
+def bench(depth = BENCH_DEPTH, fens = BENCH_POSITIONS):
+    benchSearcher = chessAI.Searcher()
+    nodeCounts = []
+    start = time.perf_counter()
+    for i, fen in enumerate(fens):
+        benchSearcher.newGame() #forget the position before, so each one is searched the same whatever comes before it
+        benchSearcher.random.seed(0)
+        gs = chessAI.newGameState(fen)
+        move = benchSearcher.findBestMovePrincipalVariation(gs, gs.getValidMoves(), depth)
+        nodeCounts.append(benchSearcher.nodes)
+        print("position", i + 1, "of", len(fens), "best move", move, "nodes", benchSearcher.nodes)
+    elapsed = time.perf_counter() - start
+    totalNodes = sum(nodeCounts)
+    signature = zlib.crc32(" ".join(str(nodes) for nodes in nodeCounts).encode())
+    print("backend", "bitboard" if chessAI.USE_BITBOARDS else "board", "depth", depth)
+    print("nodes searched", totalNodes)
+    print("total time (ms)", int(elapsed * 1000))
+    print("nodes/second", int(totalNodes / elapsed) if elapsed > 0 else 0)
+    print("signature %08x" % signature)
+    return totalNodes, elapsed, signature
+
+if __name__ == "__main__":
+    fens = [fen for fen, counts, testDepth in perft.POSITIONS.values()]
+    command = sys.argv[1] if len(sys.argv) > 1 else "features"
+    if command == "bench":
+        bench(int(sys.argv[2]) if len(sys.argv) > 2 else BENCH_DEPTH)
+    elif command == "features":
+        compareFeatures(countNodes, fens, int(sys.argv[2]) if len(sys.argv) > 2 else 4)
+    elif command == "tactics":
+        compareFeatures(solveTactics, float(sys.argv[2]) if len(sys.argv) > 2 else 1.0)
+    elif command == "depth":
+        depthForTime(fens, int(sys.argv[2]) if len(sys.argv) > 2 else 3)
+    elif command == "budget":
+        depthForTime(BENCH_POSITIONS, timeLimit = float(sys.argv[2]) if len(sys.argv) > 2 else plainSearchTime(BENCH_POSITIONS))
+    elif command == "info":
+        showInfo(fens, float(sys.argv[2]) if len(sys.argv) > 2 else 1.0)
+    elif command == "levels":
+        compareLevels(fens, int(sys.argv[2]) if len(sys.argv) > 2 else 1)
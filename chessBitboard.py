@@ -0,0 +1,274 @@
+"""
+This module stores the position as bitboards instead of only the 8x8 board.
+There is one bitboard for each of the twelve piece types plus occupancy masks for each colour and the whole board.
+Square (r, c) on the normal board is bit r*8 + c, so a8 is bit 0 and h1 is bit 63.
+The normal board is still kept up to date so the GUI, the AI and the move notation keep working unchanged.
+Moves are generated as move codes, the same as chessEngine.gameState.getValidMoveCodes.
+"""
+
+import chessEngine
+
+PIECES = chessEngine.PIECES #the twelve piece types that have a bitboard
+
+DIRECTIONS = chessEngine.DIRECTIONS #same direction order as the move tables in chessEngine
+POSITIVE_DIRECTION = [d[0] * 8 + d[1] > 0 for d in DIRECTIONS] #does the square index increase along this direction
+squaresMask = chessEngine.squaresMask #the square masks chessEngine uses are bitboards already
+ALL_SQUARES = chessEngine.ALL_SQUARES
+
+#attack tables are the chessEngine move tables turned into bitboards, so both backends share the same geometry
+KNIGHT_ATTACKS = [squaresMask(targets) for targets in chessEngine.KNIGHT_TARGETS]
+KING_ATTACKS = [squaresMask(targets) for targets in chessEngine.KING_TARGETS]
+PAWN_ATTACKS = {colour: [squaresMask(targets) for targets in chessEngine.PAWN_CAPTURES[colour]] for colour in ("w", "b")} #squares a pawn of each colour on sq attacks
+RAYS = [[squaresMask(chessEngine.RAYS[sq][j]) for sq in range(64)] for j in range(len(DIRECTIONS))] #RAYS[direction][square]
+
+"""
+BETWEEN[a][b] holds the squares strictly between a and b if they share a line, otherwise 0
+"""
+BETWEEN = [[0] * 64 for sq in range(64)]
+for fromSq in range(64):
+    for ray in chessEngine.RAYS[fromSq]:
+        between = 0
+        for toSq in ray: #nearest square first
+            BETWEEN[fromSq][toSq] = between
+            between |= 1 << toSq
+
+"""
+Returns a list of the square indices of the set bits in a bitboard
+"""
+def bitSquares(bitboard):
+    squares = []
+    while bitboard:
+        bit = bitboard & -bitboard #isolate the lowest set bit
+        squares.append(bit.bit_length() - 1)
+        bitboard ^= bit
+    return squares
+
+"""
+Returns the squares attacked along direction j from sq, stopping at (and including) the first blocker
+"""
+def slidingAttacks(sq, j, occupied):
+    ray = RAYS[j][sq]
+    blockers = ray & occupied
+    if blockers:
+        if POSITIVE_DIRECTION[j]:
+            blocker = (blockers & -blockers).bit_length() - 1 #nearest blocker is the lowest bit
+        else:
+            blocker = blockers.bit_length() - 1 #nearest blocker is the highest bit
+        ray ^= RAYS[j][blocker] #remove the squares behind the blocker
+    return ray
+
+def rookAttacks(sq, occupied):
+    return slidingAttacks(sq, 0, occupied) | slidingAttacks(sq, 1, occupied) | slidingAttacks(sq, 2, occupied) | slidingAttacks(sq, 3, occupied)
+
+def bishopAttacks(sq, occupied):
+    return slidingAttacks(sq, 4, occupied) | slidingAttacks(sq, 5, occupied) | slidingAttacks(sq, 6, occupied) | slidingAttacks(sq, 7, occupied)
+
+class bitboardGameState(chessEngine.gameState):
+    """
+    Sets the position up from a FEN string then builds the bitboards to match
+    """
+    def setFEN(self, fen):
+        super().setFEN(fen)
+        self.setBitboards()
+
+    """
+    Rebuilds every bitboard from the piece lists
+    """
+    def setBitboards(self):
+        self.pieceBitboards = {piece: squaresMask(self.pieceSquares[piece]) for piece in PIECES} #one bitboard per piece type
+        self.colourBitboards = {"w": 0, "b": 0}
+        for piece in PIECES:
+            self.colourBitboards[piece[0]] |= self.pieceBitboards[piece]
+        self.occupied = self.colourBitboards["w"] | self.colourBitboards["b"]
+
+    """
+    Makes the move on the normal board then updates the bitboards to match
+    """
+    def makeMove(self, move):
+        super().makeMove(move)
+        moveCode = move if type(move) is int else move.moveCode
+        endSq = (moveCode >> 6) & 63
+        pieceMoved = self.board[endSq >> 3][endSq & 7]
+        if moveCode & chessEngine.PROMOTION_MASK: #a pawn was promoted, so it was a pawn that moved
+            pieceMoved = "wP" if pieceMoved[0] == "w" else "bP"
+        self.toggleMoveBitboards(moveCode, pieceMoved, self.undoStack[len(self.moveLog) - 1].pieceCaptured)
+
+    """
+    Undoes the last move on the normal board then updates the bitboards to match
+    """
+    def undoMove(self):
+        if len(self.moveLog) != 0: #make sure that there is a move to undo
+            move = self.moveLog[-1]
+            moveCode = move if type(move) is int else move.moveCode
+            pieceCaptured = self.undoStack[len(self.moveLog) - 1].pieceCaptured
+            super().undoMove()
+            startSq = moveCode & 63
+            self.toggleMoveBitboards(moveCode, self.board[startSq >> 3][startSq & 7], pieceCaptured) #toggling the same bits again puts them back
+
+    """
+    Flips every bit that a move changes. Doing this twice with the same move leaves the bitboards unchanged, so it is used by both makeMove and undoMove
+    """
+    def toggleMoveBitboards(self, moveCode, pieceMoved, pieceCaptured):
+        pieceBitboards = self.pieceBitboards
+        colour = pieceMoved[0]
+        startSq = moveCode & 63
+        endSq = (moveCode >> 6) & 63
+        startBit = 1 << startSq
+        endBit = 1 << endSq
+        if moveCode & chessEngine.PROMOTION_MASK:
+            pieceBitboards[pieceMoved] ^= startBit #pawn leaves its square
+            pieceBitboards[chessEngine.PROMOTED_PIECES[pieceMoved][(moveCode & chessEngine.PROMOTION_MASK) >> chessEngine.PROMOTION_SHIFT]] ^= endBit #promoted piece appears
+        else:
+            pieceBitboards[pieceMoved] ^= startBit | endBit
+        colourChange = startBit | endBit
+        if moveCode & chessEngine.EN_PASSANT_FLAG:
+            capturedBit = 1 << ((startSq & 56) | (endSq & 7)) #captured pawn is beside the start square
+            pieceBitboards[pieceCaptured] ^= capturedBit
+            self.colourBitboards[pieceCaptured[0]] ^= capturedBit
+        elif pieceCaptured != "--":
+            pieceBitboards[pieceCaptured] ^= endBit
+            self.colourBitboards[pieceCaptured[0]] ^= endBit
+        if moveCode & chessEngine.CASTLE_FLAG:
+            rowShift = endSq & 56
+            if endSq > startSq: #kingside castle
+                rookBits = (1 << (rowShift + 7)) | (1 << (rowShift + 5))
+            else: #queenside castle
+                rookBits = (1 << rowShift) | (1 << (rowShift + 3))
+            pieceBitboards["wR" if colour == "w" else "bR"] ^= rookBits
+            colourChange |= rookBits
+        self.colourBitboards[colour] ^= colourChange
+        self.occupied = self.colourBitboards["w"] | self.colourBitboards["b"]
+
+    """
+    Returns a bitboard of the pieces of byColour that attack sq, given an occupancy
+    """
+    def attackersTo(self, sq, byColour, occupied):
+        pieceBitboards = self.pieceBitboards
+        queens = pieceBitboards[byColour + "Q"]
+        attackers = KNIGHT_ATTACKS[sq] & pieceBitboards[byColour + "N"]
+        attackers |= KING_ATTACKS[sq] & pieceBitboards[byColour + "K"]
+        attackers |= PAWN_ATTACKS["b" if byColour == "w" else "w"][sq] & pieceBitboards[byColour + "P"] #a pawn attacks sq if a pawn of the other colour on sq would attack it
+        rooks = pieceBitboards[byColour + "R"] | queens
+        if rooks:
+            attackers |= rookAttacks(sq, occupied) & rooks
+        bishops = pieceBitboards[byColour + "B"] | queens
+        if bishops:
+            attackers |= bishopAttacks(sq, occupied) & bishops
+        return attackers
+
+    """
+    Determines if the enemy can attack the square (r, c)
+    """
+    def squareUnderAttack(self, r, c):
+        enemyColour = "b" if self.whiteToMove else "w"
+        return self.attackersTo(r * 8 + c, enemyColour, self.occupied) != 0
+
+    """
+    Returns the bitboard of the pieces belonging to the side not to move
+    """
+    def getEnemyMask(self):
+        return self.colourBitboards["b" if self.whiteToMove else "w"]
+
+    """
+    generates the legal moves ending on a square in targetMask (pawn promotions are always included) as move codes using the bitboards
+    """
+    def generateMoveCodes(self):
+        moves = []
+        allyColour = "w" if self.whiteToMove else "b"
+        enemyColour = "b" if self.whiteToMove else "w"
+        pieceBitboards = self.pieceBitboards
+        allies = self.colourBitboards[allyColour]
+        occupied = self.occupied
+        kingSq = (pieceBitboards[allyColour + "K"]).bit_length() - 1
+        checkers = self.attackersTo(kingSq, enemyColour, occupied)
+        self.inCheck = checkers != 0
+
+        #king moves - the king is removed from the occupancy so it can't hide behind itself from a slider
+        occupiedWithoutKing = occupied ^ (1 << kingSq)
+        for endSq in bitSquares(KING_ATTACKS[kingSq] & ~allies & self.targetMask):
+            if not self.attackersTo(endSq, enemyColour, occupiedWithoutKing):
+                moves.append(kingSq | endSq << 6)
+
+        if checkers & (checkers - 1) == 0: #not in double check, other pieces can move
+            #squares that a non king move must end on
+            if checkers:
+                checkerSq = checkers.bit_length() - 1
+                checkMask = checkers | BETWEEN[kingSq][checkerSq] #capture the checker or block it
+            else:
+                checkMask = ALL_SQUARES
+            pinMasks = self.getPinMasks(kingSq, allyColour, enemyColour)
+            targetMask = ~allies & checkMask & self.targetMask #squares any piece other than the king may end on
+            self.getPawnMoves(allyColour, enemyColour, kingSq, checkMask, pinMasks, moves)
+            for sq in bitSquares(pieceBitboards[allyColour + "N"]):
+                if sq not in pinMasks: #a pinned knight can never move
+                    for endSq in bitSquares(KNIGHT_ATTACKS[sq] & targetMask):
+                        moves.append(sq | endSq << 6)
+            queens = pieceBitboards[allyColour + "Q"]
+            for sliders, getAttacks in ((pieceBitboards[allyColour + "R"] | queens, rookAttacks), (pieceBitboards[allyColour + "B"] | queens, bishopAttacks)):
+                for sq in bitSquares(sliders):
+                    targets = getAttacks(sq, occupied) & targetMask
+                    if sq in pinMasks:
+                        targets &= pinMasks[sq] #can only move along the pin
+                    for endSq in bitSquares(targets):
+                        moves.append(sq | endSq << 6)
+            if not checkers and self.targetMask == ALL_SQUARES: #castling isn't a capture
+                self.getCastleMoves(kingSq // 8, kingSq % 8, moves)
+
+        return moves
+
+    """
+    Returns a dictionary of pinned allied pieces, mapping each pinned square to the bitboard of squares it may still move to
+    """
+    def getPinMasks(self, kingSq, allyColour, enemyColour):
+        pinMasks = {}
+        pieceBitboards = self.pieceBitboards
+        allies = self.colourBitboards[allyColour]
+        enemyQueens = pieceBitboards[enemyColour + "Q"]
+        for j in range(len(DIRECTIONS)):
+            sliders = (pieceBitboards[enemyColour + "R"] if j < 4 else pieceBitboards[enemyColour + "B"]) | enemyQueens
+            if not RAYS[j][kingSq] & sliders:
+                continue #no enemy slider on this line, so no pin is possible
+            blockers = RAYS[j][kingSq] & self.occupied
+            if POSITIVE_DIRECTION[j]:
+                first = (blockers & -blockers).bit_length() - 1
+                rest = blockers ^ (1 << first)
+                second = (rest & -rest).bit_length() - 1 if rest else -1
+            else:
+                first = blockers.bit_length() - 1
+                rest = blockers ^ (1 << first)
+                second = rest.bit_length() - 1 if rest else -1
+            if second != -1 and (1 << first) & allies and (1 << second) & sliders: #allied piece then enemy slider
+                pinMasks[first] = BETWEEN[kingSq][second] | (1 << second)
+        return pinMasks
+
+    """
+    Get all the pawn moves for the side to move and add them to the list of moves
+    """
+    def getPawnMoves(self, allyColour, enemyColour, kingSq, checkMask, pinMasks, moves):
+        occupied = self.occupied
+        enemies = self.colourBitboards[enemyColour]
+        forward = -8 if allyColour == "w" else 8 #square index change for one step forward
+        startRow = 6 if allyColour == "w" else 1
+        quietMoves = self.targetMask == ALL_SQUARES #False when only captures and promotions are wanted
+        for sq in bitSquares(self.pieceBitboards[allyColour + "P"]):
+            allowed = checkMask & pinMasks.get(sq, ALL_SQUARES)
+            oneStep = sq + forward
+            if not (1 << oneStep) & occupied and (quietMoves or oneStep < 8 or oneStep >= 56): #1 square pawn advance
+                if (1 << oneStep) & allowed:
+                    chessEngine.addPawnMoveCodes(sq, oneStep, moves)
+                twoStep = oneStep + forward
+                if quietMoves and sq // 8 == startRow and not (1 << twoStep) & occupied and (1 << twoStep) & allowed: #2 square pawn advance
+                    moves.append(sq | twoStep << 6)
+            for endSq in bitSquares(PAWN_ATTACKS[allyColour][sq] & enemies & allowed): #captures
+                chessEngine.addPawnMoveCodes(sq, endSq, moves)
+            if self.enPassantPossible != ():
+                epSq = self.enPassantPossible[0] * 8 + self.enPassantPossible[1]
+                if PAWN_ATTACKS[allyColour][sq] & (1 << epSq):
+                    capturedSq = epSq - forward
+                    #the capture is fine if it lands on an allowed square or removes the checking pawn
+                    if (1 << epSq) & pinMasks.get(sq, ALL_SQUARES) and ((1 << epSq) | (1 << capturedSq)) & checkMask:
+                        #both pawns leave the row at once, so make sure that doesn't uncover the king
+                        occupiedAfter = (occupied ^ (1 << sq) ^ (1 << capturedSq)) | (1 << epSq)
+                        if not rookAttacks(kingSq, occupiedAfter) & (self.pieceBitboards[enemyColour + "R"] | self.pieceBitboards[enemyColour + "Q"]) and \
+                            not bishopAttacks(kingSq, occupiedAfter) & (self.pieceBitboards[enemyColour + "B"] | self.pieceBitboards[enemyColour + "Q"]):
+                            moves.append(sq | epSq << 6 | chessEngine.EN_PASSANT_FLAG)
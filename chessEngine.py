@@ -4,8 +4,247 @@ It will also be responsible for determining the valid moves at the current state
 It will also keep a move log.
 """
 
-class gameState():
+import random
+
+"""
+Moves are stored as integers (move codes) so that the search doesn't have to create a Move object for every move it looks at.
+bits 0-5: start square (row * 8 + col)
+bits 6-11: end square (row * 8 + col)
+bits 12-14: piece promoted to (0 for no promotion, then N, B, R, Q)
+bit 15: en passant capture
+bit 16: castle move
+"""
+PROMOTION_SHIFT = 12
+PROMOTION_MASK = 7 << PROMOTION_SHIFT
+PROMOTION_PIECES = ("", "N", "B", "R", "Q") #piece type for each value of the promotion bits
+PROMOTED_PIECES = {"wP": tuple("w" + piece for piece in PROMOTION_PIECES), "bP": tuple("b" + piece for piece in PROMOTION_PIECES)} #piece a pawn becomes for each value of the promotion bits
+PROMOTION_CODES = tuple(PROMOTION_PIECES.index(piece) << PROMOTION_SHIFT for piece in ("Q", "R", "B", "N")) #promotion bits for every choice, best first
+EN_PASSANT_FLAG = 1 << 15
+CASTLE_FLAG = 1 << 16
+MOVE_ID_MASK = (1 << 15) - 1 #start square, end square and promotion - enough to tell apart any two moves in the same position
+NULL_MOVE = 0 #logged by makeNullMove, a8 to a8 is never a real move
+
+PIECES = ("wP", "wR", "wN", "wB", "wQ", "wK", "bP", "bR", "bN", "bB", "bQ", "bK") #every piece that can be on the board
+COLOUR_PIECES = {"w": PIECES[:6], "b": PIECES[6:]} #the pieces belonging to each colour
+
+"""
+Adds the move code for a pawn move to the list of moves. A pawn reaching the back rank adds one move for each piece it can promote to
+"""
+def addPawnMoveCodes(startSq, endSq, moves):
+    if endSq < 8 or endSq >= 56: #back rank
+        for promotion in PROMOTION_CODES:
+            moves.append(startSq | endSq << 6 | promotion)
+    else:
+        moves.append(startSq | endSq << 6)
+
+"""
+Zobrist hashing - every piece on every square, the side to move, each castling right and each en passant file gets a random 64-bit number.
+The key of a position is all the numbers for the things that are true in it XORed together, so a move only has to XOR in and out what it changes.
+The seed is fixed so that the keys are the same every time the program runs.
+"""
+zobristRandom = random.Random(2024)
+ZOBRIST_PIECES = {piece: [zobristRandom.getrandbits(64) for sq in range(64)] for piece in PIECES} #indexed by piece then square (row * 8 + col)
+ZOBRIST_BLACK_TO_MOVE = zobristRandom.getrandbits(64)
+ZOBRIST_CASTLING_RIGHTS = [zobristRandom.getrandbits(64) for right in range(4)] #one number for each castle right
+ZOBRIST_EN_PASSANT = [zobristRandom.getrandbits(64) for col in range(8)] #indexed by the column of the en passant square
+
+"""
+Castle rights are stored as 4 bits so they can be copied and compared without creating CastleRights objects
+"""
+CASTLE_WKS = 1 #white king side
+CASTLE_BKS = 2 #black king side
+CASTLE_WQS = 4 #white queen side
+CASTLE_BQS = 8 #black queen side
+ZOBRIST_CASTLING = [0] * 16 #part of the Zobrist key for every combination of castle rights
+for rights in range(16):
+    for i in range(4):
+        if rights & (1 << i):
+            ZOBRIST_CASTLING[rights] ^= ZOBRIST_CASTLING_RIGHTS[i]
+
+"""
+CASTLE_RIGHTS_KEPT[sq] holds the castle rights that survive a move from or to sq.
+Moving a king or a rook off its starting square, or capturing a rook on its starting square, loses the matching rights.
+"""
+CASTLE_RIGHTS_KEPT = [15] * 64
+CASTLE_RIGHTS_KEPT[0] = 15 & ~CASTLE_BQS #a8 rook
+CASTLE_RIGHTS_KEPT[4] = 15 & ~(CASTLE_BKS | CASTLE_BQS) #e8 king
+CASTLE_RIGHTS_KEPT[7] = 15 & ~CASTLE_BKS #h8 rook
+CASTLE_RIGHTS_KEPT[56] = 15 & ~CASTLE_WQS #a1 rook
+CASTLE_RIGHTS_KEPT[60] = 15 & ~(CASTLE_WKS | CASTLE_WQS) #e1 king
+CASTLE_RIGHTS_KEPT[63] = 15 & ~CASTLE_WKS #h1 rook
+
+SQUARE_TUPLES = [(sq >> 3, sq & 7) for sq in range(64)] #(row, col) for every square index, made once so moves don't have to create new tuples
+
+"""
+Evaluation tables. The material and position score of the board is kept up to date by makeMove and undoMove in integer centipawns (hundredths of a pawn),
+so the search can score a position without looking at the pieces.
+"""
+MATERIAL_SCORES = {"K": 0, "Q": 900, "R": 500, "B": 300, "N": 300, "P": 100} #material value of each piece type in centipawns
+
+#positional scores, in tenths of a pawn
+knightScores = [[1, 1, 1, 1, 1, 1, 1, 1],
+                [1, 2, 2, 2, 2, 2, 2, 1],
+                [1, 2, 3, 3, 3, 3, 2, 1],
+                [1, 2, 3, 4, 4, 3, 2, 1],
+                [1, 2, 3, 4, 4, 3, 2, 1],
+                [1, 2, 3, 3, 3, 3, 2, 1],
+                [1, 2, 2, 2, 2, 2, 2, 1],
+                [1, 1, 1, 1, 1, 1, 1, 1]] 
+
+bishopScores = [[4, 3, 2, 1, 1, 2, 3, 4],
+                [3, 4, 3, 2, 2, 3, 4, 3],
+                [2, 3, 4, 3, 3, 4, 3, 2],
+                [1, 2, 3, 4, 4, 3, 2, 1],
+                [1, 2, 3, 4, 4, 3, 2, 1],
+                [2, 3, 4, 3, 3, 4, 3, 2],
+                [3, 4, 3, 2, 2, 3, 4, 3],
+                [4, 3, 2, 1, 1, 2, 3, 4]]
+
+queenScores = [[1, 1, 1, 3, 1, 1, 1, 1],
+               [1, 2, 3, 3, 3, 1, 1, 1],
+               [1, 4, 3, 3, 3, 4, 2, 1],
+               [1, 2, 3, 3, 3, 2, 2, 1],
+               [1, 2, 3, 3, 3, 2, 2, 1],
+               [1, 4, 3, 3, 3, 4, 2, 1],
+               [1, 1, 2, 3, 3, 1, 1, 1],
+               [1, 1, 1, 3, 1, 1, 1, 1]]
+
+rookScores = [[4, 3, 4, 4, 4, 4, 3, 4],
+              [4, 4, 4, 4, 4, 4, 4, 4],
+              [1, 1, 2, 3, 3, 2, 1, 1],
+              [1, 2, 3, 4, 4, 3, 2, 1],
+              [1, 2, 3, 4, 4, 3, 2, 1],
+              [1, 1, 2, 2, 2, 2, 1, 1],
+              [4, 4, 4, 4, 4, 4, 4, 4],
+              [4, 3, 4, 4, 4, 4, 3, 4]]
+
+whitePawnScores = [[8, 8, 8, 8, 8, 8, 8, 8],
+                   [8, 8, 8, 8, 8, 8, 8, 8],
+                   [5, 6, 6, 7, 7, 6, 6, 5],
+                   [2, 3, 3, 5, 5, 3, 3, 2],
+                   [1, 2, 3, 4, 4, 3, 2, 1],
+                   [1, 1, 2, 3, 3, 2, 1, 1],
+                   [1, 1, 1, 0, 0, 1, 1, 1],
+                   [0, 0, 0, 0, 0, 0, 0, 0]]
+
+blackPawnScores = [[0, 0, 0, 0, 0, 0, 0, 0],
+                   [1, 1, 1, 0, 0, 1, 1, 1],
+                   [1, 1, 2, 3, 3, 2, 1, 1],
+                   [1, 2, 3, 4, 4, 3, 2, 1],
+                   [2, 3, 3, 5, 5, 3, 3, 2],
+                   [5, 6, 6, 7, 7, 6, 6, 5],
+                   [8, 8, 8, 8, 8, 8, 8, 8],
+                   [8, 8, 8, 8, 8, 8, 8, 8]]
+
+piecePositionScores = {"N": knightScores, "Q": queenScores, "B": bishopScores, "R": rookScores, "bP": blackPawnScores, "wP": whitePawnScores}
+
+"""
+PIECE_SQUARE_SCORES[piece][sq] is what a piece on sq adds to the score in centipawns: its material plus its position score, positive for white and negative for black
+"""
+PIECE_SQUARE_SCORES = {}
+for piece in PIECES:
+    positionScores = piecePositionScores.get(piece) or piecePositionScores.get(piece[1]) #pawns have a table for each colour, kings don't have one
+    sign = 1 if piece[0] == "w" else -1
+    PIECE_SQUARE_SCORES[piece] = [sign * (MATERIAL_SCORES[piece[1]] + (positionScores[sq >> 3][sq & 7] * 10 if positionScores else 0)) for sq in range(64)]
+DEBUG_EVALUATION = False #True makes makeMove and undoMove check the incremental score against a full recalculation
+
+"""
+Move tables are built once when the module is imported so the move generators only have to look squares up instead of working out the board geometry every time.
+They hold square indices (row * 8 + col) and are shared by every board backend.
+Directions are (row change, col change). The first four are orthogonal (rook) and the last four are diagonal (bishop).
+"""
+DIRECTIONS = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
+ROOK_DIRECTIONS = (0, 1, 2, 3) #indices into DIRECTIONS
+BISHOP_DIRECTIONS = (4, 5, 6, 7)
+OPPOSITE_DIRECTION = tuple(DIRECTIONS.index((-d[0], -d[1])) for d in DIRECTIONS) #index of the direction pointing the other way
+KNIGHT_JUMPS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+
+"""
+Returns a tuple of the squares reached by jumping from sq by each of the offsets, leaving out any that are off the board
+"""
+def targetSquares(sq, offsets):
+    r, c = sq >> 3, sq & 7
+    return tuple((r + d[0]) * 8 + c + d[1] for d in offsets if (0 <= r + d[0] < 8) and (0 <= c + d[1] < 8))
+
+"""
+Returns a tuple of the squares from sq to the edge of the board in direction d, nearest first and not including sq
+"""
+def raySquares(sq, d):
+    squares = []
+    endRow, endCol = (sq >> 3) + d[0], (sq & 7) + d[1]
+    while (0 <= endRow < 8) and (0 <= endCol < 8): #still on the board
+        squares.append(endRow * 8 + endCol)
+        endRow += d[0]
+        endCol += d[1]
+    return tuple(squares)
+
+KNIGHT_TARGETS = [targetSquares(sq, KNIGHT_JUMPS) for sq in range(64)] #squares a knight on sq can jump to
+KING_TARGETS = [targetSquares(sq, DIRECTIONS) for sq in range(64)] #squares a king on sq can step to
+RAYS = [[raySquares(sq, d) for d in DIRECTIONS] for sq in range(64)] #RAYS[sq][j] is the ray from sq in direction j
+PAWN_PUSHES = {"w": [RAYS[sq][0][:2 if sq >> 3 == 6 else 1] for sq in range(64)], #squares a white pawn on sq can advance to, in order
+               "b": [RAYS[sq][2][:2 if sq >> 3 == 1 else 1] for sq in range(64)]} #squares a black pawn on sq can advance to, in order
+PAWN_CAPTURES = {"w": [targetSquares(sq, ((-1, -1), (-1, 1))) for sq in range(64)], #squares a white pawn on sq attacks
+                 "b": [targetSquares(sq, ((1, -1), (1, 1))) for sq in range(64)]} #squares a black pawn on sq attacks
+
+"""
+Square masks are ints with bit (row * 8 + col) set for each square in them, so testing whether a square is in one is a single AND
+"""
+def squaresMask(squares):
+    mask = 0
+    for sq in squares:
+        mask |= 1 << sq
+    return mask
+
+ALL_SQUARES = (1 << 64) - 1
+DIRECTION_INDEX = {d: j for j, d in enumerate(DIRECTIONS)} #index into DIRECTIONS for each (row change, col change)
+RAY_MASKS = [[squaresMask(ray) for ray in RAYS[sq]] for sq in range(64)] #RAY_MASKS[sq][j] is RAYS[sq][j] as a square mask
+
+"""
+FEN (Forsyth-Edwards Notation) describes a position in one line: the pieces rank by rank from rank 8, the side to move, castle rights, en passant square, halfmove clock and fullmove number
+"""
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+FEN_PIECES = {char: ("w" if char.isupper() else "b") + char.upper() for char in "PRNBQKprnbqk"} #piece for each FEN letter
+PIECE_FEN_LETTERS = {piece: letter for letter, piece in FEN_PIECES.items()} #FEN letter for each piece
+FEN_CASTLING = (("K", CASTLE_WKS), ("Q", CASTLE_WQS), ("k", CASTLE_BKS), ("q", CASTLE_BQS)) #castle right for each FEN letter, in FEN order
+
+UNDO_STACK_SIZE = 128 #number of undo records made up front, more are added in blocks of this size if a game ever gets longer
+
+"""
+An UndoRecord holds everything about a position that can't be worked out from the move alone, so undoMove can put it back.
+One record is made for every ply up front and reused, so making and undoing moves doesn't create any objects.
+"""
+class UndoRecord():
+    __slots__ = ("castlingRights", "enPassantCol", "pieceCaptured", "zobristKey", "halfmoveClock", "evaluation")
+
     def __init__(self):
+        self.castlingRights = 0 #castle rights bits before the move
+        self.enPassantCol = -1 #column of the en passant square before the move, -1 if there wasn't one
+        self.pieceCaptured = "--" #piece captured by the move
+        self.zobristKey = 0 #Zobrist key before the move
+        self.halfmoveClock = 0 #halfmove clock before the move
+        self.evaluation = 0 #material and position score before the move
+
+class gameState():
+    def __init__(self, fen = STARTING_FEN):
+        self.moveFunctions = {"P": self.getPawnMoves, "R": self.getRookMoves, "N": self.getKnightMoves, "B": self.getBishopMoves, "Q": self.getQueenMoves, "K": self.getKingMoves} #dictionary of all our move functions
+        self.undoStack = [UndoRecord() for i in range(UNDO_STACK_SIZE)] #undoStack[i] holds what is needed to undo moveLog[i]
+        self.useAttackMap = False #True makes squareUnderAttack use the cached attack maps
+        self.attackMaps = {"w": None, "b": None} #squares attacked by each colour, cleared whenever the position changes
+        self.setFEN(fen) #the starting position unless another one is given
+
+    """
+    Creates a gameState in the position described by a FEN string
+    """
+    @classmethod
+    def fromFEN(cls, fen):
+        return cls(fen)
+
+    """
+    Sets the position up from a FEN string, clearing the move log.
+    Everything kept up to date by makeMove and undoMove is rebuilt here, so loading many positions can reuse one gameState instead of creating a new one for each.
+    """
+    def setFEN(self, fen):
+        fields = fen.split()
         """
         board is an 8x8 2D array.
         Each element of the array contains 2 characters.
@@ -13,77 +252,271 @@ class gameState():
         The second character represents what type of piece it is (either "K", "Q", "R", "B", "N" or "P").
         "--" represents an empty space on the board with no piece.
         """
-        self.board = [
-            ["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"],
-            ["bP", "bP", "bP", "bP", "bP", "bP", "bP", "bP"],
-            ["--", "--", "--", "--", "--", "--", "--", "--"],
-            ["--", "--", "--", "--", "--", "--", "--", "--"],
-            ["--", "--", "--", "--", "--", "--", "--", "--"],
-            ["--", "--", "--", "--", "--", "--", "--", "--"],
-            ["wP", "wP", "wP", "wP", "wP", "wP", "wP", "wP"],
-            ["wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"]
-        ]
-
-        self.moveFunctions = {"P": self.getPawnMoves, "R": self.getRookMoves, "N": self.getKnightMoves, "B": self.getBishopMoves, "Q": self.getQueenMoves, "K": self.getKingMoves} #dictionary of all our move functions
-        self.whiteToMove = True
-        self.moveLog = []
-        self.whiteKingLocation = (7, 4)
-        self.blackKingLocation = (0, 4)
+        self.board = []
+        for rank in fields[0].split("/"): #ranks go from 8 down to 1, the same order as the rows
+            row = []
+            for char in rank:
+                if char in "12345678": #run of empty squares
+                    row.extend(["--"] * int(char))
+                else:
+                    row.append(FEN_PIECES[char])
+            self.board.append(row)
+        self.whiteToMove = fields[1] == "w"
+        self.castlingRights = 0 #castle rights bits
+        for letter, right in FEN_CASTLING:
+            if letter in fields[2]:
+                self.castlingRights |= right
+        self.enPassantPossible = () #coordinates for the square where an En Passant capture is possible
+        if fields[3] != "-":
+            self.enPassantPossible = SQUARE_TUPLES[(8 - int(fields[3][1])) * 8 + "abcdefgh".index(fields[3][0])]
+        self.halfmoveClock = int(fields[4]) if len(fields) > 4 else 0 #moves since the last capture or pawn move
+        fullmoveNumber = int(fields[5]) if len(fields) > 5 else 1
+        self.startPly = (fullmoveNumber - 1) * 2 + (0 if self.whiteToMove else 1) #plies played before this position, so toFEN can work out the fullmove number
+        self.moveLog = [] #Move objects or move codes, whichever was passed to makeMove
+        self.setPieceSquares() #squares of every piece, kept up to date by makeMove and undoMove
+        self.whiteKingLocation = SQUARE_TUPLES[min(self.pieceSquares["wK"])]
+        self.blackKingLocation = SQUARE_TUPLES[min(self.pieceSquares["bK"])]
         self.inCheck = False
         self.pins = []
         self.checks = []
         self.checkmate = False
         self.stalemate = False
-        self.enPassantPossible = () #coordinates for the square where an En Passant capture is possible
-        self.enPassantPossibleLog = [self.enPassantPossible]
-        self.currentCastlingRights = CastleRights(True, True, True, True)
-        self.castleRightsLog = [CastleRights(self.currentCastlingRights.wks, self.currentCastlingRights.bks, self.currentCastlingRights.wqs, self.currentCastlingRights.bqs)]
+        self.checkMask = ALL_SQUARES #squares a piece other than the king can move to, set by getValidMoveCodes
+        self.pinMasks = {} #line each pinned piece has to stay on, keyed by its square, set by getValidMoveCodes
+        self.targetMask = ALL_SQUARES #squares moves are generated to, only the enemy pieces while getCaptureMoveCodes runs
+        self.attackMaps["w"] = self.attackMaps["b"] = None
+        self.currentZobristKey = self.computeZobristKey() #64-bit key identifying this position, kept up to date by makeMove and undoMove
+        self.evaluation = self.computeEvaluation() #material and position score in centipawns from white's point of view, kept up to date by makeMove and undoMove
 
     """
-    takes a move object as a parameter and executes it (will not work for castling, pawn promotion or en-passant)
+    Returns the FEN string of the current position
+    """
+    def toFEN(self):
+        ranks = []
+        for row in self.board:
+            rank = ""
+            empty = 0 #empty squares since the last piece
+            for piece in row:
+                if piece == "--":
+                    empty += 1
+                else:
+                    if empty:
+                        rank += str(empty)
+                        empty = 0
+                    rank += PIECE_FEN_LETTERS[piece]
+            if empty:
+                rank += str(empty)
+            ranks.append(rank)
+        castling = "".join(letter for letter, right in FEN_CASTLING if self.castlingRights & right) or "-"
+        enPassant = "-"
+        if self.enPassantPossible != ():
+            enPassant = Move.colsToFiles[self.enPassantPossible[1]] + Move.rowsToRanks[self.enPassantPossible[0]]
+        fullmoveNumber = (self.startPly + len(self.moveLog)) // 2 + 1
+        return " ".join(("/".join(ranks), "w" if self.whiteToMove else "b", castling, enPassant, str(self.halfmoveClock), str(fullmoveNumber)))
+
+    """
+    Rebuilds the piece lists from self.board.
+    pieceSquares[piece] is the set of squares (row * 8 + col) that piece is on, so the move generators and the evaluation can go straight to the pieces instead of scanning all 64 squares.
+    """
+    def setPieceSquares(self):
+        self.pieceSquares = {piece: set() for piece in PIECES}
+        for r in range(8):
+            for c in range(8):
+                piece = self.board[r][c]
+                if piece != "--": #not an empty square
+                    self.pieceSquares[piece].add(r * 8 + c)
+
+    """
+    The current castle rights as a CastleRights object
+    """
+    @property
+    def currentCastlingRights(self):
+        rights = self.castlingRights
+        return CastleRights(rights & CASTLE_WKS != 0, rights & CASTLE_BKS != 0, rights & CASTLE_WQS != 0, rights & CASTLE_BQS != 0)
+
+    """
+    The Zobrist key of the current position
+    """
+    @property
+    def zobristKey(self):
+        return self.currentZobristKey
+
+    """
+    Calculates the Zobrist key of the current position from scratch
+    """
+    def computeZobristKey(self):
+        key = 0
+        for r in range(8):
+            for c in range(8):
+                piece = self.board[r][c]
+                if piece != "--": #not an empty square
+                    key ^= ZOBRIST_PIECES[piece][r * 8 + c]
+        if not self.whiteToMove:
+            key ^= ZOBRIST_BLACK_TO_MOVE
+        key ^= ZOBRIST_CASTLING[self.castlingRights]
+        if self.enPassantPossible != ():
+            key ^= ZOBRIST_EN_PASSANT[self.enPassantPossible[1]]
+        return key
+
+    """
+    Calculates the material and position score of the current position from scratch, in centipawns from white's point of view
+    """
+    def computeEvaluation(self):
+        score = 0
+        for piece, squares in self.pieceSquares.items():
+            pieceSquareScores = PIECE_SQUARE_SCORES[piece]
+            for sq in squares:
+                score += pieceSquareScores[sq]
+        return score
+
+    """
+    takes a move as a parameter and executes it. The move can be a Move object or a move code
     """
     def makeMove(self, move):
-        self.board[move.startRow][move.startCol] = "--"
-        self.board[move.endRow][move.endCol] = move.pieceMoved
+        ply = len(self.moveLog)
+        if ply == len(self.undoStack): #game is longer than the undo stack, so make it bigger
+            self.undoStack.extend(UndoRecord() for i in range(UNDO_STACK_SIZE))
         self.moveLog.append(move) #log the move for later
+        if type(move) is not int: #Move object, use its move code
+            move = move.moveCode
+        startSq = move & 63
+        endSq = (move >> 6) & 63
+        startRow, startCol = startSq >> 3, startSq & 7
+        endRow, endCol = endSq >> 3, endSq & 7
+        board = self.board
+        pieceMoved = board[startRow][startCol]
+        if move & EN_PASSANT_FLAG:
+            pieceCaptured = "wP" if pieceMoved == "bP" else "bP"
+        else:
+            pieceCaptured = board[endRow][endCol] #could also be an empty square
+        #save what undoMove will need
+        record = self.undoStack[ply]
+        record.castlingRights = self.castlingRights
+        record.enPassantCol = self.enPassantPossible[1] if self.enPassantPossible != () else -1
+        record.pieceCaptured = pieceCaptured
+        record.zobristKey = key = self.currentZobristKey
+        record.halfmoveClock = self.halfmoveClock
+        record.evaluation = evaluation = self.evaluation
+        evaluation -= PIECE_SQUARE_SCORES[pieceMoved][startSq] #moved piece leaves its start square
+        key ^= ZOBRIST_BLACK_TO_MOVE #turn switches
+        key ^= ZOBRIST_PIECES[pieceMoved][startSq] #moved piece leaves its start square
+        if move & EN_PASSANT_FLAG:
+            key ^= ZOBRIST_PIECES[pieceCaptured][startRow * 8 + endCol] #captured pawn is beside the start square
+        elif pieceCaptured != "--":
+            key ^= ZOBRIST_PIECES[pieceCaptured][endSq]
+        if self.enPassantPossible != ():
+            key ^= ZOBRIST_EN_PASSANT[self.enPassantPossible[1]] #old en passant square goes
+        self.attackMaps["w"] = self.attackMaps["b"] = None #position is changing so the attack maps are out of date
+        board[startRow][startCol] = "--"
+        board[endRow][endCol] = pieceMoved
+        pieceSquares = self.pieceSquares
+        pieceSquares[pieceMoved].remove(startSq)
+        if move & EN_PASSANT_FLAG:
+            pieceSquares[pieceCaptured].remove(startRow * 8 + endCol)
+            evaluation -= PIECE_SQUARE_SCORES[pieceCaptured][startRow * 8 + endCol] #captured pawn is beside the start square
+        elif pieceCaptured != "--":
+            pieceSquares[pieceCaptured].remove(endSq)
+            evaluation -= PIECE_SQUARE_SCORES[pieceCaptured][endSq]
         self.whiteToMove = not self.whiteToMove #switch turns
         #update the king's location if moved
-        if move.pieceMoved == "wK":
-            self.whiteKingLocation = (move.endRow, move.endCol)
-        elif move.pieceMoved == "bK":
-            self.blackKingLocation = (move.endRow, move.endCol)
+        if pieceMoved == "wK":
+            self.whiteKingLocation = SQUARE_TUPLES[endSq]
+        elif pieceMoved == "bK":
+            self.blackKingLocation = SQUARE_TUPLES[endSq]
         #pawn promotion
-        if move.isPawnPromotion: #is this move a pawn promotion?
-            """
-            askForPiece = True #flag variable for input
-            while askForPiece: #ask for piece until valid piece is inputted
-                newPiece = input("Promote to a Queen(Q), Rook(R), Bishop(B) or Knight(N): ") #ask for piece in console
-                if newPiece == "Q" or newPiece == "R" or newPiece == "B" or newPiece == "N": #if valid piece input
-                    askForPiece = False #get out of loop
-            """
-            newPiece = "Q"
-            self.board[move.endRow][move.endCol] = move.pieceMoved[0] + newPiece #promote pawn to new piece
+        if move & PROMOTION_MASK: #is this move a pawn promotion?
+            board[endRow][endCol] = PROMOTED_PIECES[pieceMoved][(move & PROMOTION_MASK) >> PROMOTION_SHIFT] #promote pawn to the chosen piece
+        pieceSquares[board[endRow][endCol]].add(endSq)
+        key ^= ZOBRIST_PIECES[board[endRow][endCol]][endSq] #moved (or promoted) piece arrives on its end square
+        evaluation += PIECE_SQUARE_SCORES[board[endRow][endCol]][endSq]
         #en passant
-        if move.isEnPassantMove:
-            self.board[move.startRow][move.endCol] = "--" #capturing the pawn
+        if move & EN_PASSANT_FLAG:
+            board[startRow][endCol] = "--" #capturing the pawn
         #update enPassantPossible variable
-        if move.pieceMoved[1] == "P" and abs(move.startRow - move.endRow) == 2: #only on 2 square pawn advances
-            self.enPassantPossible = ((move.startRow + move.endRow)//2, move.startCol) #coordinates of en passant square
+        if pieceMoved[1] == "P" and abs(startRow - endRow) == 2: #only on 2 square pawn advances
+            self.enPassantPossible = SQUARE_TUPLES[(startSq + endSq) >> 1] #coordinates of en passant square
+            key ^= ZOBRIST_EN_PASSANT[startCol] #new en passant square comes in
         else: #whenever any other move is made
             self.enPassantPossible = () #reset variable
-        #update en passant log
-        self.enPassantPossibleLog.append(self.enPassantPossible)
         #castle move
-        if move.isCastleMove:
-            if (move.endCol - move.startCol) == 2: #kingside castle move
-                self.board[move.endRow][move.endCol-1] = self.board[move.endRow][move.endCol+1] #moves rook
-                self.board[move.endRow][move.endCol+1] = "--" #erase old rook
+        if move & CASTLE_FLAG:
+            rook = "wR" if pieceMoved == "wK" else "bR"
+            if (endCol - startCol) == 2: #kingside castle move
+                board[endRow][endCol-1] = board[endRow][endCol+1] #moves rook
+                board[endRow][endCol+1] = "--" #erase old rook
+                key ^= ZOBRIST_PIECES[rook][endRow * 8 + 7] ^ ZOBRIST_PIECES[rook][endRow * 8 + 5] #rook goes from col 7 to col 5
+                pieceSquares[rook].remove(endRow * 8 + 7)
+                pieceSquares[rook].add(endRow * 8 + 5)
+                evaluation += PIECE_SQUARE_SCORES[rook][endRow * 8 + 5] - PIECE_SQUARE_SCORES[rook][endRow * 8 + 7]
             else: #queenside castle move
-                self.board[move.endRow][move.endCol+1] = self.board[move.endRow][move.endCol-2] #moves rook
-                self.board[move.endRow][move.endCol-2] = "--" #erase old rook
-        #update castling rights - whenever it is a rook or a king move
-        self.updateCastleRights(move) #update our castle rights
-        self.castleRightsLog.append(CastleRights(self.currentCastlingRights.wks, self.currentCastlingRights.bks, self.currentCastlingRights.wqs, self.currentCastlingRights.bqs)) #add to our castleRightsLog
+                board[endRow][endCol+1] = board[endRow][endCol-2] #moves rook
+                board[endRow][endCol-2] = "--" #erase old rook
+                key ^= ZOBRIST_PIECES[rook][endRow * 8] ^ ZOBRIST_PIECES[rook][endRow * 8 + 3] #rook goes from col 0 to col 3
+                pieceSquares[rook].remove(endRow * 8)
+                pieceSquares[rook].add(endRow * 8 + 3)
+                evaluation += PIECE_SQUARE_SCORES[rook][endRow * 8 + 3] - PIECE_SQUARE_SCORES[rook][endRow * 8]
+        #update castling rights - whenever a king or rook leaves its square or a rook is captured
+        newRights = self.castlingRights & CASTLE_RIGHTS_KEPT[startSq] & CASTLE_RIGHTS_KEPT[endSq]
+        if newRights != self.castlingRights:
+            key ^= ZOBRIST_CASTLING[self.castlingRights] ^ ZOBRIST_CASTLING[newRights] #swap old castle rights for new ones
+            self.castlingRights = newRights
+        #update the halfmove clock
+        if pieceMoved[1] == "P" or pieceCaptured != "--":
+            self.halfmoveClock = 0
+        else:
+            self.halfmoveClock += 1
+        self.currentZobristKey = key
+        self.evaluation = evaluation
+        if DEBUG_EVALUATION:
+            assert evaluation == self.computeEvaluation(), "incremental evaluation is wrong after " + str(move)
+
+    """
+    Passes the turn without moving a piece, for null move pruning in the search. Only the side to move and the en passant square change.
+    It is logged as NULL_MOVE and has to be undone with undoNullMove
+    """
+    def makeNullMove(self):
+        ply = len(self.moveLog)
+        if ply == len(self.undoStack): #game is longer than the undo stack, so make it bigger
+            self.undoStack.extend(UndoRecord() for i in range(UNDO_STACK_SIZE))
+        self.moveLog.append(NULL_MOVE)
+        record = self.undoStack[ply]
+        record.enPassantCol = self.enPassantPossible[1] if self.enPassantPossible != () else -1
+        record.zobristKey = key = self.currentZobristKey
+        record.halfmoveClock = self.halfmoveClock
+        key ^= ZOBRIST_BLACK_TO_MOVE #turn switches
+        if self.enPassantPossible != ():
+            key ^= ZOBRIST_EN_PASSANT[self.enPassantPossible[1]] #en passant is only possible straight after the pawn moved
+            self.enPassantPossible = ()
+        self.whiteToMove = not self.whiteToMove
+        self.halfmoveClock += 1
+        self.currentZobristKey = key
+
+    """
+    undo the null move made by makeNullMove
+    """
+    def undoNullMove(self):
+        self.moveLog.pop()
+        record = self.undoStack[len(self.moveLog)]
+        self.whiteToMove = not self.whiteToMove
+        if record.enPassantCol != -1: #en passant square is behind a pawn of the side that didn't move
+            self.enPassantPossible = SQUARE_TUPLES[(16 if self.whiteToMove else 40) + record.enPassantCol]
+        self.currentZobristKey = record.zobristKey
+        self.halfmoveClock = record.halfmoveClock
+        self.checkmate = False
+        self.stalemate = False
+
+    """
+    Returns True if the side to move may make a null move: the last move wasn't a null move, and it has a piece other than its king and pawns.
+    With only king and pawns it could be in zugzwang, where passing would be better than any real move, so the null move would give a wrong result
+    """
+    def nullMoveAllowed(self):
+        if self.moveLog and type(self.moveLog[-1]) is int and self.moveLog[-1] == NULL_MOVE:
+            return False
+        pieceSquares = self.pieceSquares
+        for piece in COLOUR_PIECES["w" if self.whiteToMove else "b"]:
+            if piece[1] not in "KP" and pieceSquares[piece]:
+                return True
+        return False
 
     """
     undo the last move made
@@ -91,77 +524,75 @@ class gameState():
     def undoMove(self):
         if len(self.moveLog) != 0: #make sure that there is a move to undo
             move = self.moveLog.pop() #take the last move out of the moveLog
-            self.board[move.startRow][move.startCol] = move.pieceMoved #puts the moved piece where it originally was
-            self.board[move.endRow][move.endCol] = move.pieceCaptured #puts the captured piece back
+            if type(move) is not int: #Move object, use its move code
+                move = move.moveCode
+            record = self.undoStack[len(self.moveLog)]
+            startSq = move & 63
+            endSq = (move >> 6) & 63
+            startRow, startCol = startSq >> 3, startSq & 7
+            endRow, endCol = endSq >> 3, endSq & 7
+            board = self.board
+            pieceCaptured = record.pieceCaptured
+            pieceMoved = board[endRow][endCol]
+            pieceSquares = self.pieceSquares
+            pieceSquares[pieceMoved].remove(endSq)
+            if move & PROMOTION_MASK: #a pawn was promoted, so it was a pawn that moved
+                pieceMoved = "wP" if pieceMoved[0] == "w" else "bP"
+            pieceSquares[pieceMoved].add(startSq)
+            self.attackMaps["w"] = self.attackMaps["b"] = None #position is changing so the attack maps are out of date
+            board[startRow][startCol] = pieceMoved #puts the moved piece where it originally was
+            board[endRow][endCol] = pieceCaptured #puts the captured piece back
             self.whiteToMove = not self.whiteToMove #switch turns
             #update the king's location if moved
-            if move.pieceMoved == "wK":
-                self.whiteKingLocation = (move.startRow, move.startCol)
-            elif move.pieceMoved == "bK":
-                self.blackKingLocation = (move.startRow, move.startCol)
+            if pieceMoved == "wK":
+                self.whiteKingLocation = SQUARE_TUPLES[startSq]
+            elif pieceMoved == "bK":
+                self.blackKingLocation = SQUARE_TUPLES[startSq]
             #undo en passant move
-            if move.isEnPassantMove:
-                self.board[move.endRow][move.endCol] = "--" #leave landing square blank
-                self.board[move.startRow][move.endCol] = move.pieceCaptured #put piece back where it was
-            self.enPassantPossibleLog.pop()
-            self.enPassantPossible = self.enPassantPossibleLog[-1]
-            #undo castling rights
-            self.castleRightsLog.pop() #get rid of the last castling rights
-            newRights = self.castleRightsLog[-1]
-            self.currentCastlingRights = CastleRights(newRights.wks, newRights.bks, newRights.wqs, newRights.bqs) #set the current castling rights to the now last one
+            if move & EN_PASSANT_FLAG:
+                board[endRow][endCol] = "--" #leave landing square blank
+                board[startRow][endCol] = pieceCaptured #put piece back where it was
+                pieceSquares[pieceCaptured].add(startRow * 8 + endCol)
+            elif pieceCaptured != "--":
+                pieceSquares[pieceCaptured].add(endSq)
+            #put back the state saved in the undo record
+            if record.enPassantCol == -1:
+                self.enPassantPossible = ()
+            else: #en passant square is behind a pawn of the side that didn't make the move
+                self.enPassantPossible = SQUARE_TUPLES[(16 if self.whiteToMove else 40) + record.enPassantCol]
+            self.castlingRights = record.castlingRights
+            self.currentZobristKey = record.zobristKey
+            self.halfmoveClock = record.halfmoveClock
+            self.evaluation = record.evaluation
             #undo castle move
-            if move.isCastleMove:
-                if (move.endCol - move.startCol) == 2: #kingside
-                    self.board[move.endRow][move.endCol+1] = self.board[move.endRow][move.endCol-1] #moves rook back
-                    self.board[move.endRow][move.endCol-1] = "--"
+            if move & CASTLE_FLAG:
+                rook = "wR" if pieceMoved == "wK" else "bR"
+                if (endCol - startCol) == 2: #kingside
+                    board[endRow][endCol+1] = board[endRow][endCol-1] #moves rook back
+                    board[endRow][endCol-1] = "--"
+                    pieceSquares[rook].remove(endRow * 8 + 5)
+                    pieceSquares[rook].add(endRow * 8 + 7)
                 else: #queenside
-                    self.board[move.endRow][move.endCol-2] = self.board[move.endRow][move.endCol+1] #moves rook back
-                    self.board[move.endRow][move.endCol+1] = "--"
+                    board[endRow][endCol-2] = board[endRow][endCol+1] #moves rook back
+                    board[endRow][endCol+1] = "--"
+                    pieceSquares[rook].remove(endRow * 8 + 3)
+                    pieceSquares[rook].add(endRow * 8)
             
             self.checkmate = False #when we undo a move we can't be in checkmate
             self.stalemate = False #when we undo a move we can't be in stalemate
+            if DEBUG_EVALUATION:
+                assert self.evaluation == self.computeEvaluation(), "incremental evaluation is wrong after undoing " + str(move)
 
     """
-    Updates the castle rights given the move
-    """
-    def updateCastleRights(self, move):
-        if move.pieceMoved == "wK": #white king
-            self.currentCastlingRights.wks = False
-            self.currentCastlingRights.wqs = False
-        elif move.pieceMoved == "bK": #black king
-            self.currentCastlingRights.bks = False
-            self.currentCastlingRights.bqs = False
-        elif move.pieceMoved == "wR": #white rooks
-            if move.startRow == 7:
-                if move.startCol == 0: #left rook
-                    self.currentCastlingRights.wqs = False
-                elif move.startCol == 7: #right rook
-                    self.currentCastlingRights.wks = False
-        elif move.pieceMoved == "bR": #black rooks
-            if move.startRow == 0:
-                if move.startCol == 0: #left rook
-                    self.currentCastlingRights.bqs = False
-                if move.startCol == 7: #right rook
-                    self.currentCastlingRights.bks = False
-
-        #if a rook is captured
-        if move.pieceCaptured == "wR":
-            if move.endRow == 7:
-                if move.endCol == 0:
-                    self.currentCastlingRights.wqs = False #white queenside
-                elif move.endCol == 7:
-                    self.currentCastlingRights.wks = False #white kingside
-        elif move.pieceCaptured == "bR":
-            if move.endRow == 0:
-                if move.endCol == 0:
-                    self.currentCastlingRights.bqs = False #black queenside
-                if move.endCol == 7:
-                    self.currentCastlingRights.bks = False #black kingside
-
-    """
-    generates all moves considering checks
+    generates all moves considering checks, as Move objects for the GUI and move notation
     """
     def getValidMoves(self):
+        return [Move.fromMoveCode(moveCode, self.board) for moveCode in self.getValidMoveCodes()]
+
+    """
+    generates all moves considering checks, as move codes for the search
+    """
+    def getValidMoveCodes(self):
         """
         #naive algorithm
         moves = self.getAllPossibleMoves() #generate all possible moves
@@ -190,6 +621,44 @@ class gameState():
         """
 
         #advanced algorithm
+        moves = self.generateMoveCodes()
+        if len(moves) == 0: #are there no more valid moves left
+            if self.inCheck: #king is in check
+                self.checkmate = True #must be checkmate
+                #print("Checkmate:", self.checkmate)
+            else: #king is not in check
+                self.stalemate = True #must be stalemate
+                #print("Stalemate:", self.stalemate)
+        else: #since there are still valid moves left, it is not checkmate or stalemate
+            self.checkmate = False
+            self.stalemate = False
+
+        return moves
+
+    """
+    generates only the legal captures and promotions as move codes, for the quiescence search.
+    Sets inCheck like getValidMoveCodes but doesn't change checkmate or stalemate, since not every move has been looked at.
+    """
+    def getCaptureMoveCodes(self):
+        self.targetMask = self.getEnemyMask() #moves have to end on an enemy piece
+        moves = self.generateMoveCodes()
+        self.targetMask = ALL_SQUARES
+        return moves
+
+    """
+    Returns the square mask of the pieces belonging to the side not to move
+    """
+    def getEnemyMask(self):
+        enemyMask = 0
+        for piece in COLOUR_PIECES["b" if self.whiteToMove else "w"]:
+            for sq in self.pieceSquares[piece]:
+                enemyMask |= 1 << sq
+        return enemyMask
+
+    """
+    generates the legal moves ending on a square in targetMask (pawn promotions are always included) and sets inCheck
+    """
+    def generateMoveCodes(self):
         moves = []
         self.inCheck, self.pins, self.checks = self.checkForPinsAndChecks()
         if self.whiteToMove: #white's turn
@@ -198,54 +667,42 @@ class gameState():
         else: #black's turn
             kingRow = self.blackKingLocation[0] #find the king's row
             kingCol = self.blackKingLocation[1] #find the king's column
+        self.setCheckAndPinMasks(kingRow * 8 + kingCol)
         
         if self.inCheck:
-            if len(self.checks) == 1: #only 1 check, block check or move king
+            if len(self.checks) == 1: #only 1 check, block check or move king - the check mask only lets other pieces block or capture
                 moves = self.getAllPossibleMoves() #generate all possible moves
-                if self.whiteToMove: #white's turn
-                    self.getCastleMoves(self.whiteKingLocation[0], self.whiteKingLocation[1], moves)
-                else: #black's turn
-                    self.getCastleMoves(self.blackKingLocation[0], self.blackKingLocation[1], moves)
-                #to block a check you have to move a piece inbetween the enemy piece and the king
-                check = self.checks[0] #check information
-                checkRow = check[0]
-                checkCol = check[1]
-                pieceChecking = self.board[checkRow][checkCol] #finds enemy piece causing the check
-                validSquares = [] #will hold squares that pieces can move to
-                if pieceChecking[1] == "N": #if the enemy piece is a knight, you must capture the knight or move the king
-                    validSquares = [(checkRow, checkCol)]
-                else: #other pieces can be blocked
-                    for i in range(1, 8):
-                        validSquare = (kingRow + check[2] * i, kingCol + check[3] * i) #check[2] and check[3] are the check directions
-                        validSquares.append(validSquare)
-                        if validSquare[0] == checkRow and validSquare[1] == checkCol: #once you get to the checking piece, break 
-                            break
-                #get rid of any moves that don't block check or move king
-                for i in range(len(moves)-1, -1, -1): #go through the list backwards
-                    if moves[i].pieceMoved[1] != "K": #move doesn't move the king so it must block or capture
-                        if not (moves[i].endRow, moves[i].endCol) in validSquares: #move doesn't block check or capture piece
-                            moves.remove(moves[i]) #move must be removed
             else: #double check, king has to move
                 self.getKingMoves(kingRow, kingCol, moves)
         else: #not in check, all moves are fine
             moves = self.getAllPossibleMoves()
-            if self.whiteToMove: #white's turn
-                self.getCastleMoves(self.whiteKingLocation[0], self.whiteKingLocation[1], moves)
-            else: #black's turn
-                self.getCastleMoves(self.blackKingLocation[0], self.blackKingLocation[1], moves)          
-        if len(moves) == 0: #are there no more valid moves left
-            if self.inCheck: #king is in check
-                self.checkmate = True #must be checkmate
-                #print("Checkmate:", self.checkmate)
-            else: #king is not in check
-                self.stalemate = True #must be stalemate
-                #print("Stalemate:", self.stalemate)
-        else: #since there are still valid moves left, it is not checkmate or stalemate
-            self.checkmate = False
-            self.stalemate = False
+            if self.targetMask == ALL_SQUARES: #castling isn't a capture
+                self.getCastleMoves(kingRow, kingCol, moves)
 
         return moves
     
+    """
+    Works out the check mask and pin masks from the checks and pins found by checkForPinsAndChecks, so the move generators only make legal moves.
+    checkMask has every square a piece other than the king can move to - all of them when not in check, the checking piece and the squares between it and the king in single check, none in double check.
+    pinMasks holds the line from the king through each pinned piece, which that piece can't leave.
+    """
+    def setCheckAndPinMasks(self, kingSq):
+        self.pinMasks = {}
+        for pin in self.pins:
+            self.pinMasks[pin[0] * 8 + pin[1]] = RAY_MASKS[kingSq][DIRECTION_INDEX[(pin[2], pin[3])]]
+        if not self.inCheck:
+            self.checkMask = ALL_SQUARES
+        elif len(self.checks) > 1: #double check, only the king can move
+            self.checkMask = 0
+        else:
+            check = self.checks[0]
+            checkSq = check[0] * 8 + check[1]
+            j = DIRECTION_INDEX.get((check[2], check[3]))
+            if j is None: #knight check, it can only be captured
+                self.checkMask = 1 << checkSq
+            else: #squares from the king up to and including the checking piece
+                self.checkMask = RAY_MASKS[kingSq][j] & ~RAY_MASKS[checkSq][j]
+
     """
     Returns if the player is in check, a list of pins and a list of checks
     """
@@ -264,56 +721,49 @@ class gameState():
             startRow = self.blackKingLocation[0]
             startCol = self.blackKingLocation[1]
         #check outward from king for pins and checks, keep track of pins
-        directions = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
-        for j in range(len(directions)):
-            d = directions[j]
+        kingSq = startRow * 8 + startCol
+        board = self.board
+        for j in range(8):
+            ray = RAYS[kingSq][j]
             possiblePin = () #reset possible pins
-            for i in range(1, 8):
-                endRow = startRow + d[0] * i
-                endCol = startCol + d[1] * i
-                if (0 <= endRow < 8) and (0 <= endCol < 8): #checks square is on the board
-                    endPiece = self.board[endRow][endCol]
-                    if endPiece[0] == allyColour and endPiece[1] != "K": #checks if piece is allied and if the piece is not a king type piece
-                        if possiblePin == (): #1st allied piece could be pinned
-                            possiblePin = (endRow, endCol, d[0], d[1])
-                        else: #2nd allied piece, so no pin or check possible in this direction
-                            break
-                    elif endPiece[0] == enemyColour: #checks if piece is an enemy
-                        type = endPiece[1]
-                        """
-                        There are 5 possibilities here in this complex conditional statement
-                        #1) Orthogonally away from king and piece is a rook
-                        #2) Diagonally away from king and piece is a bishop
-                        #3) 1 square away diagonally from king and piece is a pawn
-                        #4) any direction and piece is a queen
-                        #5) any direction 1 square away and piece is a king (this is necessary to prevent a king move to a square controlled by another king)
-                        """
-                        if (0 <= j <= 3) and (type == "R") or \
-                            (4 <= j <= 7) and (type == "B") or \
-                            ((i == 1 and type == "P") and ((enemyColour == "w" and 6 <= j <= 7) or (enemyColour == "b" and 4 <= j <= 5))) or \
-                            (type == "Q") or (i == 1 and type == "K"):
-                                if possiblePin == (): #no piece is blocking, so it is a check
-                                    inCheck = True
-                                    checks.append((endRow, endCol, d[0], d[1]))
-                                    break
-                                else: #piece is blocking, so it is a pin
-                                    pins.append(possiblePin)
-                                    break
-                        else: #enemy piece is not checking
-                            break
-                else: #if a piece is off the board
-                    break
+            for endSq in ray:
+                endPiece = board[endSq >> 3][endSq & 7]
+                if endPiece[0] == allyColour and endPiece[1] != "K": #checks if piece is allied and if the piece is not a king type piece
+                    if possiblePin == (): #1st allied piece could be pinned
+                        possiblePin = (endSq >> 3, endSq & 7) + DIRECTIONS[j]
+                    else: #2nd allied piece, so no pin or check possible in this direction
+                        break
+                elif endPiece[0] == enemyColour: #checks if piece is an enemy
+                    type = endPiece[1]
+                    """
+                    There are 5 possibilities here in this complex conditional statement
+                    #1) Orthogonally away from king and piece is a rook
+                    #2) Diagonally away from king and piece is a bishop
+                    #3) 1 square away diagonally from king and piece is a pawn
+                    #4) any direction and piece is a queen
+                    #5) any direction 1 square away and piece is a king (this is necessary to prevent a king move to a square controlled by another king)
+                    """
+                    if (0 <= j <= 3) and (type == "R") or \
+                        (4 <= j <= 7) and (type == "B") or \
+                        ((endSq == ray[0] and type == "P") and ((enemyColour == "w" and 6 <= j <= 7) or (enemyColour == "b" and 4 <= j <= 5))) or \
+                        (type == "Q") or (endSq == ray[0] and type == "K"):
+                            if possiblePin == (): #no piece is blocking, so it is a check
+                                inCheck = True
+                                checks.append((endSq >> 3, endSq & 7) + DIRECTIONS[j])
+                                break
+                            else: #piece is blocking, so it is a pin
+                                pins.append(possiblePin)
+                                break
+                    else: #enemy piece is not checking
+                        break
 
         #check for knight checks
-        knightMoves = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
-        for m in knightMoves:
-            endRow = startRow + m[0]
-            endCol = startCol + m[1]
-            if (0 <= endRow < 8) and (0 <= endCol < 8):
-                endPiece = self.board[endRow][endCol]
-                if endPiece[0] == enemyColour and endPiece[1] == "N": #enemy knight attacking king
-                    inCheck = True
-                    checks.append((endRow, endCol, m[0], m[1]))
+        for endSq in KNIGHT_TARGETS[kingSq]:
+            endRow, endCol = endSq >> 3, endSq & 7
+            endPiece = board[endRow][endCol]
+            if endPiece[0] == enemyColour and endPiece[1] == "N": #enemy knight attacking king
+                inCheck = True
+                checks.append((endRow, endCol, endRow - startRow, endCol - startCol))
         
         return inCheck, pins, checks
     
@@ -332,25 +782,74 @@ class gameState():
     Determines if the enemy can attack the square (r, c)
     """
     def squareUnderAttack(self, r, c):
-        self.whiteToMove = not self.whiteToMove #switch to opponent's turn
-        oppMoves = self.getAllPossibleMoves() #generate opponent's moves
-        self.whiteToMove = not self.whiteToMove #switch turns back
-        for move in oppMoves: #iterate through opponent's moves
-            if move.endRow == r and move.endCol == c: #square is under attack
-                return True #returns that the square is under attack
-        return False #returns that the square is not under attack
+        enemyColour = "b" if self.whiteToMove else "w"
+        if self.useAttackMap: #look the square up in the cached map instead
+            return self.getAttackMap(enemyColour)[r][c]
+        return self.squareAttackedBy(r * 8 + c, enemyColour)
+
+    """
+    Determines if a piece of the given colour could move to sq, looking outward from sq on the current board
+    """
+    def squareAttackedBy(self, sq, enemyColour):
+        board = self.board
+        for j in range(8):
+            ray = RAYS[sq][j]
+            for endSq in ray:
+                endPiece = board[endSq >> 3][endSq & 7]
+                if endPiece != "--": #first piece in this direction
+                    if endPiece[0] == enemyColour:
+                        type = endPiece[1]
+                        #same possibilities as checkForPinsAndChecks
+                        if (0 <= j <= 3) and (type == "R") or \
+                            (4 <= j <= 7) and (type == "B") or \
+                            ((endSq == ray[0] and type == "P") and ((enemyColour == "w" and 6 <= j <= 7) or (enemyColour == "b" and 4 <= j <= 5))) or \
+                            (type == "Q") or (endSq == ray[0] and type == "K"):
+                                return True
+                    break #anything behind this piece is blocked
+        #check for knights
+        for endSq in KNIGHT_TARGETS[sq]:
+            endPiece = board[endSq >> 3][endSq & 7]
+            if endPiece[0] == enemyColour and endPiece[1] == "N": #enemy knight attacking the square
+                return True
+        return False
 
     """
-    generates all moves without considering checks
+    Returns an 8x8 array of booleans showing every square the given colour attacks.
+    The map is cached until the next makeMove or undoMove.
+    """
+    def getAttackMap(self, colour):
+        if self.attackMaps[colour] is None: #not cached for this position yet
+            attackMap = [[False] * 8 for r in range(8)]
+            for piece in COLOUR_PIECES[colour]: #only this colour's pieces, straight from pieceSquares
+                type = piece[1]
+                for sq in self.pieceSquares[piece]:
+                    if type == "P":
+                        targets = PAWN_CAPTURES[colour][sq]
+                    elif type == "N":
+                        targets = KNIGHT_TARGETS[sq]
+                    elif type == "K":
+                        targets = KING_TARGETS[sq]
+                    else: #sliding piece
+                        targets = ()
+                        for j in (ROOK_DIRECTIONS if type == "R" else BISHOP_DIRECTIONS if type == "B" else range(8)):
+                            for endSq in RAYS[sq][j]:
+                                attackMap[endSq >> 3][endSq & 7] = True
+                                if self.board[endSq >> 3][endSq & 7] != "--": #blocked after this square
+                                    break
+                    for endSq in targets:
+                        attackMap[endSq >> 3][endSq & 7] = True
+            self.attackMaps[colour] = attackMap
+        return self.attackMaps[colour]
+
+    """
+    generates all moves for the side to move, using the check and pin masks from setCheckAndPinMasks
     """
     def getAllPossibleMoves(self):
         moves = [] #empty list
-        for r in range(len(self.board)): #loops through rows in board
-            for c in range(len(self.board[r])): #loops through cols in given row
-                turn = self.board[r][c][0] #stores either b or w
-                if (turn == "w" and self.whiteToMove) or (turn == "b" and not self.whiteToMove): #checks if it is the piece's turn to move
-                    piece = self.board[r][c][1] #stores either "K", "Q", "R", "B", "N" or "P"
-                    self.moveFunctions[piece](r, c, moves) #calls the appropriate move function
+        for piece in COLOUR_PIECES["w" if self.whiteToMove else "b"]: #only the pieces of the side to move
+            moveFunction = self.moveFunctions[piece[1]] #the appropriate move function
+            for sq in self.pieceSquares[piece]: #every square this piece is on
+                moveFunction(sq >> 3, sq & 7, moves)
         
         return moves
 
@@ -358,235 +857,100 @@ class gameState():
     Get all the pawn moves for the pawn located at row, col and add these moves to the list of all possible moves
     """
     def getPawnMoves(self, r, c, moves):
-        piecePinned = False
-        pinDirection = ()
-        for i in range(len(self.pins)-1, -1, -1): #go through the list of pins backwards
-            if self.pins[i][0] == r and self.pins[i][1] == c: #if the piece is pinned
-                piecePinned = True #sets piece as pinned
-                pinDirection = (self.pins[i][2], self.pins[i][3]) #finds what direction the pin is from
-                self.pins.remove(self.pins[i]) #removes pin from list
-                break
+        startSq = r * 8 + c
+        pinMask = self.pinMasks.get(startSq, ALL_SQUARES) #squares the pawn can move to without leaving a pin
+        legal = self.checkMask & pinMask #squares the pawn can move to without leaving its king in check
 
         if self.whiteToMove: #white pawn moves
-            kingRow, kingCol = self.whiteKingLocation #find white king
-
-            if self.board[r-1][c] == "--": #1 square pawn advance
-                if not piecePinned or pinDirection == (-1, 0): #is it pinned?
-                    moves.append(Move((r, c), (r-1, c), self.board))
-                    if r == 6 and self.board[r-2][c] == "--": #2 square pawn advance
-                        moves.append(Move((r, c), (r-2, c), self.board))
-
-            if c-1 >= 0: #captures on the left side of the board
-                if not piecePinned or pinDirection == (-1, -1): #is it pinned?
-                    if self.board[r-1][c-1][0] == "b": #checks there is an enemy piece to capture
-                        moves.append(Move((r, c), (r-1, c-1), self.board))
-                    elif (r-1, c-1) == self.enPassantPossible: #EN PASSANT
-            
-                        attackingPiece = blockingPiece = False #initialise variables
-                        if kingRow == r: #if king is on same row
-                            if kingCol < c: #if king is on the left
-                                insideRange = range(kingCol+1, c-1) #range between king and pawn
-                                outsideRange = range(c+1, 8) #range between pawn and border
-                            else: #if king is on the right
-                                insideRange = range(kingCol-1, c, -1) #range between king and pawn
-                                outsideRange = range(c-2, -1, -1) #range between pawn and border
-                            
-                            for i in insideRange:
-                                if self.board[r][i] != "--": #if blocking piece
-                                    blockingPiece = True
- 
-                            for i in outsideRange:
-                                square = self.board[r][i]
-                                if square[0] == "b" and (square[1] == "R" or square[1] == "Q"): #if attacking piece
-                                    attackingPiece = True
-                                elif square != "--": #if blocking piece
-                                    blockingPiece = True
-                        
-                        if not attackingPiece or blockingPiece:
-                            moves.append(Move((r, c), (r-1, c-1), self.board, isEnPassantMove=True))
-
-            if c+1 <= 7: #captures on the right side of the board
-                if not piecePinned or pinDirection == (-1, 1): #is it pinned?
-                    if self.board[r-1][c+1][0] == "b": #checks there is an enemy piece to capture
-                        moves.append(Move((r, c), (r-1, c+1), self.board))
-                    elif (r-1, c+1) == self.enPassantPossible: #EN PASSANT
-
-                        attackingPiece = blockingPiece = False #initialise variables
-                        if kingRow == r: #if king is on same row
-                            if kingCol < c: #if king is on the left
-                                insideRange = range(kingCol+1, c) #range between king and pawn
-                                outsideRange = range(c+2, 8) #range between pawn and border
-                            else: #if king is on the right
-                                insideRange = range(kingCol-1, c+1, -1) #range between king and pawn
-                                outsideRange = range(c-1, -1, -1) #range between pawn and border
-                            
-                            for i in insideRange:
-                                if self.board[r][i] != "--": #if blocking piece
-                                    blockingPiece = True
- 
-                            for i in outsideRange:
-                                square = self.board[r][i]
-                                if square[0] == "b" and (square[1] == "R" or square[1] == "Q"): #if attacking piece
-                                    attackingPiece = True
-                                elif square != "--": #if blocking piece
-                                    blockingPiece = True
-                        
-                        if not attackingPiece or blockingPiece:
-                            moves.append(Move((r, c), (r-1, c+1), self.board, isEnPassantMove=True))
-
+            allyColour, enemyColour = "w", "b"
+            kingSq = self.whiteKingLocation[0] * 8 + self.whiteKingLocation[1] #find white king
         else: #black pawn moves
-            kingRow, kingCol = self.blackKingLocation #find black king
-            
-            if self.board[r+1][c] == "--": #1 square pawn advance
-                if not piecePinned or pinDirection == (1, 0): #is it pinned?
-                    moves.append(Move((r, c), (r+1, c), self.board))
-                    if r == 1 and self.board[r+2][c] == "--": #2 square pawn advance
-                        moves.append(Move((r, c), (r+2, c), self.board))
-
-            if c-1 >= 0: #captures on the left side of the board
-                if not piecePinned or pinDirection == (1, -1): #is it pinned?
-                    if self.board[r+1][c-1][0] == "w": #checks there is an enemy piece to capture
-                        moves.append(Move((r, c), (r+1, c-1), self.board))
-                    elif (r+1, c-1) == self.enPassantPossible: #EN PASSANT
-
-                        attackingPiece = blockingPiece = False #initialise variables
-                        if kingRow == r: #if king is on same row
-                            if kingCol < c: #if king is on the left
-                                insideRange = range(kingCol+1, c-1) #range between king and pawn
-                                outsideRange = range(c+1, 8) #range between pawn and border
-                            else: #if king is on the right
-                                insideRange = range(kingCol-1, c, -1) #range between king and pawn
-                                outsideRange = range(c-2, -1, -1) #range between pawn and border
-                            
-                            for i in insideRange:
-                                if self.board[r][i] != "--": #if blocking piece
-                                    blockingPiece = True
- 
-                            for i in outsideRange:
-                                square = self.board[r][i]
-                                if square[0] == "w" and (square[1] == "R" or square[1] == "Q"): #if attacking piece
-                                    attackingPiece = True
-                                elif square != "--": #if blocking piece
-                                    blockingPiece = True
-                        
-                        if not attackingPiece or blockingPiece:
-                            moves.append(Move((r, c), (r+1, c-1), self.board, isEnPassantMove=True))
-
-            if c+1 <= 7: #captures on the right side of the board
-                if not piecePinned or pinDirection == (1, 1): #is it pinned?
-                    if self.board[r+1][c+1][0] == "w": #checks there is an enemy piece to capture
-                        moves.append(Move((r, c), (r+1, c+1), self.board))
-                    elif (r+1, c+1) == self.enPassantPossible: #EN PASSANT
-
-                        attackingPiece = blockingPiece = False #initialise variables
-                        if kingRow == r: #if king is on same row
-                            if kingCol < c: #if king is on the left
-                                insideRange = range(kingCol+1, c) #range between king and pawn
-                                outsideRange = range(c+2, 8) #range between pawn and border
-                            else: #if king is on the right
-                                insideRange = range(kingCol-1, c+1, -1) #range between king and pawn
-                                outsideRange = range(c-1, -1, -1) #range between pawn and border
-                            
-                            for i in insideRange:
-                                if self.board[r][i] != "--": #if blocking piece
-                                    blockingPiece = True
- 
-                            for i in outsideRange:
-                                square = self.board[r][i]
-                                if square[0] == "w" and (square[1] == "R" or square[1] == "Q"): #if attacking piece
-                                    attackingPiece = True
-                                elif square != "--": #if blocking piece
-                                    blockingPiece = True
-                        
-                        if not attackingPiece or blockingPiece:
-                            moves.append(Move((r, c), (r+1, c+1), self.board, isEnPassantMove=True))
+            allyColour, enemyColour = "b", "w"
+            kingSq = self.blackKingLocation[0] * 8 + self.blackKingLocation[1] #find black king
+        board = self.board
+
+        quietMoves = self.targetMask == ALL_SQUARES #False when only captures and promotions are wanted
+        for endSq in PAWN_PUSHES[allyColour][startSq]: #1 square advance, then 2 squares from the starting row
+            if board[endSq >> 3][endSq & 7] != "--": #blocked, so the pawn can't go any further
+                break
+            if legal >> endSq & 1 and (quietMoves or endSq < 8 or endSq >= 56):
+                addPawnMoveCodes(startSq, endSq, moves)
+
+        for endSq in PAWN_CAPTURES[allyColour][startSq]: #captures on either side
+            endRow, endCol = SQUARE_TUPLES[endSq]
+            if board[endRow][endCol][0] == enemyColour: #checks there is an enemy piece to capture
+                if legal >> endSq & 1:
+                    addPawnMoveCodes(startSq, endSq, moves)
+            elif SQUARE_TUPLES[endSq] == self.enPassantPossible: #EN PASSANT
+                capturedSq = r * 8 + endCol
+                #en passant gets out of check by blocking with the pawn or by taking the checking pawn
+                if pinMask >> endSq & 1 and (self.checkMask >> endSq & 1 or self.checkMask >> capturedSq & 1):
+                    if not self.enPassantUncoversKing(kingSq, startSq, capturedSq, enemyColour):
+                        moves.append(startSq | endSq << 6 | EN_PASSANT_FLAG)
+
+    """
+    Returns True if taking en passant would leave the king in check along its row.
+    Both pawns leave the row at once, so a rook or queen behind them could be uncovered even though neither pawn is pinned on its own.
+    """
+    def enPassantUncoversKing(self, kingSq, pawnSq, capturedSq, enemyColour):
+        if kingSq >> 3 != pawnSq >> 3: #king isn't on the same row as the pawns
+            return False
+        for sq in RAYS[kingSq][3 if kingSq < pawnSq else 1]: #look from the king towards the pawns
+            if sq == pawnSq or sq == capturedSq: #both pawns will be gone
+                continue
+            piece = self.board[sq >> 3][sq & 7]
+            if piece != "--": #first piece along the row after the pawns
+                return piece[0] == enemyColour and (piece[1] == "R" or piece[1] == "Q")
+        return False
 
     """
     Get all the rook moves for the rook located at row, col and add these moves to the list of all possible moves
     """
     def getRookMoves(self, r, c, moves):
-        piecePinned = False
-        pinDirection = ()
-        for i in range(len(self.pins)-1, -1, -1): #look through pins backwards
-            if self.pins[i][0] == r and self.pins[i][1] == c: #if piece is pinned
-                piecePinned = True #sets piece as pinned
-                pinDirection = (self.pins[i][2], self.pins[i][3]) #finds what direction the pin is from
-                if self.board[r][c][1] != "Q": #can't remove queen from pin on rook moves, only on bishop moves
-                    self.pins.remove(self.pins[i]) #remove pin from list
-                break
+        self.getSlidingMoves(r * 8 + c, ROOK_DIRECTIONS, moves)
 
-        directions = ((-1, 0), (0, -1), (1, 0), (0, 1)) #what directions the rook can move in
+    """
+    Adds the moves along each of the given directions for the sliding piece on startSq, stopping at the first piece in each direction
+    """
+    def getSlidingMoves(self, startSq, directions, moves):
         enemyColour = "b" if self.whiteToMove else "w" #finds out who the opposing colour is
-        for d in directions: #looping through all four directions
-            for i in range(1, 8):
-                endRow = r + d[0] * i #each iteration of i goes up a space on the board in the direction we are checking
-                endCol = c + d[1] * i
-                if (0 <= endRow < 8) and (0 <= endCol < 8): #checks if the space is on the board
-                    if not piecePinned or pinDirection == d or pinDirection == (-d[0], -d[1]): #is it pinned?
-                        endPiece = self.board[endRow][endCol]
-                        if endPiece == "--": #checks if it is an empty space - valid
-                            moves.append(Move((r, c), (endRow, endCol), self.board))
-                        elif endPiece[0] == enemyColour: #checks if it is an enemy piece - valid
-                            moves.append(Move((r, c), (endRow, endCol), self.board))
-                            break #makes sure we don't go any further up the board
-                        else: #otherwise it must be a friendly piece - invalid
-                            break #makes sure we don't go any further up the board
-                else: #otherwise must be off the board
-                    break #makes sure we don't go off the board
+        legal = self.checkMask & self.targetMask & self.pinMasks.get(startSq, ALL_SQUARES) #squares the piece can move to without leaving its king in check
+        board = self.board
+        for j in directions:
+            if not legal & RAY_MASKS[startSq][j]: #nothing legal in this direction, e.g. it leaves a pin
+                continue
+            for endSq in RAYS[startSq][j]: #each square going away from the piece in this direction
+                endPiece = board[endSq >> 3][endSq & 7]
+                if endPiece == "--": #checks if it is an empty space - valid
+                    if legal >> endSq & 1:
+                        moves.append(startSq | endSq << 6)
+                elif endPiece[0] == enemyColour: #checks if it is an enemy piece - valid
+                    if legal >> endSq & 1:
+                        moves.append(startSq | endSq << 6)
+                    break #makes sure we don't go any further up the board
+                else: #otherwise it must be a friendly piece - invalid
+                    break #makes sure we don't go any further up the board
 
     """
     Get all the knight moves for the knight located at row, col and add these moves to the list of all possible moves
     """
     def getKnightMoves(self, r, c, moves):
-        piecePinned = False
-        for i in range(len(self.pins)-1, -1, -1): #loop through pins backwards
-            if self.pins[i][0] == r and self.pins[i][1] == c: #if it is pinned
-                piecePinned = True #set piece to pinned
-                self.pins.remove(self.pins[i]) #remove pin from list
-                break
+        startSq = r * 8 + c
+        if startSq in self.pinMasks: #a pinned knight can never move
+            return
 
-        directions = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)) #what directions the knight can move in
         allyColour = "w" if self.whiteToMove else "b" #finds out the allied colour
-        for d in directions: #looping through all the knight's possible directions
-            endRow = r + d[0] #finds the endRow of this move
-            endCol = c + d[1] #finds the endCol of this move
-            if (0 <= endRow < 8) and (0 <= endCol < 8): #checks it is on the board
-                if not piecePinned: #is it pinned?
-                    endPiece = self.board[endRow][endCol] #finds this space on the board
-                    if endPiece[0] != allyColour: #if the space is not an allied colour, then it must be empty or an enemy - valid
-                        moves.append(Move((r, c), (endRow, endCol), self.board)) #append move
+        legal = self.checkMask & self.targetMask
+        board = self.board
+        for endSq in KNIGHT_TARGETS[startSq]: #looping through all the squares the knight can jump to
+            if board[endSq >> 3][endSq & 7][0] != allyColour and legal >> endSq & 1: #if the space is not an allied colour, then it must be empty or an enemy - valid
+                moves.append(startSq | endSq << 6) #append move
 
     """
     Get all the bishop moves for the bishop located at row, col and add these moves to the list of all possible moves
     """
     def getBishopMoves(self, r, c, moves):
-        piecePinned = False
-        pinDirection = ()
-        for i in range(len(self.pins)-1, -1, -1): #loop through pins backwards
-            if self.pins[i][0] == r and self.pins[i][1] == c: #if it is pinned
-                piecePinned = True #set piece to pinned
-                pinDirection = (self.pins[i][2], self.pins[i][3]) #finds what direction the pin is
-                self.pins.remove(self.pins[i]) #remove pin from list
-                break
-
-        directions = ((-1, -1), (-1, 1), (1, -1), (1, 1)) #what directions the bishop can move in
-        enemyColour = "b" if self.whiteToMove else "w" #finds out who the opposing colour is
-        for d in directions: #looping through all four directions
-            for i in range(1, 8):
-                endRow = r + d[0] * i #each iteration of i goes up a space on the board in the direction we are checking
-                endCol = c + d[1] * i
-                if (0 <= endRow < 8) and (0 <= endCol < 8): #checks if the space is on the board
-                    if not piecePinned or pinDirection == d or pinDirection == (-d[0], -d[1]): #is it pinned?
-                        endPiece = self.board[endRow][endCol]
-                        if endPiece == "--": #checks if it is an empty space - valid
-                            moves.append(Move((r, c), (endRow, endCol), self.board))
-                        elif endPiece[0] == enemyColour: #checks if it is an enemy piece - valid
-                            moves.append(Move((r, c), (endRow, endCol), self.board))
-                            break #makes sure we don't go any further up the board
-                        else: #otherwise it must be a friendly piece - invalid
-                            break #makes sure we don't go any further up the board
-                else: #otherwise must be off the board
-                    break #makes sure we don't go off the board
+        self.getSlidingMoves(r * 8 + c, BISHOP_DIRECTIONS, moves)
     
     """
     Get all the queen moves for the queen located at row, col and add these moves to the list of all possible moves
@@ -599,28 +963,17 @@ class gameState():
     Get all the king moves for the king located at row, col and add these moves to the list of all possible moves
     """
     def getKingMoves(self, r, c, moves):
-        rowMoves = (-1, -1, -1, 0, 0, 1, 1, 1) #list of row moves for the king
-        colMoves = (-1, 0, 1, -1, 1, -1, 0, 1) #list of column moves for the king
-        allyColour = "w" if self.whiteToMove else "b" #finds allied colour
-        for i in range(8):
-            endRow = r + rowMoves[i]
-            endCol = c + colMoves[i]
-            if (0 <= endRow < 8) and (0 <= endCol < 8): #is it on the board
-                endPiece = self.board[endRow][endCol]
-                if endPiece[0] != allyColour: #not an ally piece (empty or enemy piece)
-                    #place king on the end square and check for checks
-                    if allyColour == "w": #white's turn
-                        self.whiteKingLocation = (endRow, endCol)
-                    else: #black's turn
-                        self.blackKingLocation = (endRow, endCol)
-                    inCheck, pins, checks = self.checkForPinsAndChecks()
-                    if not inCheck: #is the king in check?
-                        moves.append(Move((r, c), (endRow, endCol), self.board)) #if not, this is a valid move
-                    #place king back on original location
-                    if allyColour == "w": #white's turn
-                        self.whiteKingLocation = (r, c)
-                    else: #black's turn
-                        self.blackKingLocation = (r, c)
+        startSq = r * 8 + c
+        allyColour, enemyColour = ("w", "b") if self.whiteToMove else ("b", "w") #finds allied colour
+        board = self.board
+        king = board[r][c]
+        board[r][c] = "--" #lift the king off so a sliding piece checking it also covers the square behind it
+        for endSq in KING_TARGETS[startSq]:
+            endPiece = board[endSq >> 3][endSq & 7]
+            if endPiece[0] != allyColour and self.targetMask >> endSq & 1: #not an ally piece (empty or enemy piece)
+                if not self.squareAttackedBy(endSq, enemyColour): #would the king be in check on the end square?
+                    moves.append(startSq | endSq << 6) #if not, this is a valid move
+        board[r][c] = king #place king back on original location
 
     """
     Generate all valid castle moves for the king at (r, c) and add them to the list of moves
@@ -628,20 +981,20 @@ class gameState():
     def getCastleMoves(self, r, c, moves):
         if self.squareUnderAttack(r, c):
             return #can't castle while in check
-        if (self.whiteToMove and self.currentCastlingRights.wks) or (not self.whiteToMove and self.currentCastlingRights.bks):
+        if self.castlingRights & (CASTLE_WKS if self.whiteToMove else CASTLE_BKS):
             self.getKingsideCastleMoves(r, c, moves) #white or black can castle king side
-        if (self.whiteToMove and self.currentCastlingRights.wqs) or (not self.whiteToMove and self.currentCastlingRights.bqs):
+        if self.castlingRights & (CASTLE_WQS if self.whiteToMove else CASTLE_BQS):
             self.getQueensideCastleMoves(r, c, moves) #white or black can castle queen side
 
     def getKingsideCastleMoves(self, r, c, moves):
         if self.board[r][c+1] == "--" and self.board[r][c+2] == "--":
             if not self.squareUnderAttack(r, c+1) and not self.squareUnderAttack(r, c+2):
-                moves.append(Move((r, c), (r, c+2), self.board, isCastleMove=True))
+                moves.append(r * 8 + c | (r * 8 + c + 2) << 6 | CASTLE_FLAG)
 
     def getQueensideCastleMoves(self, r, c, moves):
         if self.board[r][c-1] == "--" and self.board[r][c-2] == "--" and self.board[r][c-3] == "--":
             if not self.squareUnderAttack(r, c-1) and not self.squareUnderAttack(r, c-2):
-                moves.append(Move((r, c), (r, c-2), self.board, isCastleMove=True))
+                moves.append(r * 8 + c | (r * 8 + c - 2) << 6 | CASTLE_FLAG)
     
 class CastleRights():
     def __init__(self, wks, bks, wqs, bqs):
@@ -652,13 +1005,17 @@ class CastleRights():
         self.wqs = wqs
         self.bqs = bqs
 
+"""
+A Move object describes a move for the GUI and move notation. The search uses plain move codes instead and only builds a Move when one is needed.
+"""
 class Move():
+    __slots__ = ("startRow", "startCol", "endRow", "endCol", "pieceMoved", "pieceCaptured", "isPawnPromotion", "promotionChoice", "isEnPassantMove", "isCastleMove", "isCaptureMove", "moveCode", "moveID")
     ranksToRows = {"1": 7, "2": 6, "3": 5, "4": 4, "5": 3, "6": 2, "7": 1, "8": 0} #maps the ranks in real life chess to the rows on our board
     rowsToRanks = {v: k for k, v in ranksToRows.items()} #flips the keys and values around
     filesToCols = {"a": 0, "b": 1, "c": 2, "d": 3, "e": 4, "f": 5, "g": 6, "h": 7} #maps the files in real life chess to the columns on our board
     colsToFiles = {v: k for k, v in filesToCols.items()} #flips the keys and values around
 
-    def __init__(self, startSq, endSq, board, isEnPassantMove = False, isCastleMove = False):
+    def __init__(self, startSq, endSq, board, isEnPassantMove = False, isCastleMove = False, promotionChoice = "Q"):
         self.startRow = startSq[0]
         self.startCol = startSq[1]
         self.endRow = endSq[0]
@@ -667,8 +1024,10 @@ class Move():
         self.pieceCaptured = board[self.endRow][self.endCol] #could also be an empty square
         #pawn promotion        
         self.isPawnPromotion = False #pawn promotion flag variable
+        self.promotionChoice = "" #piece type the pawn is promoted to
         if (self.pieceMoved == "wP" and self.endRow == 0) or (self.pieceMoved == "bP" and self.endRow == 7): #is the piece moved a pawn and is it on the back rank?
             self.isPawnPromotion = True #flag as true
+            self.promotionChoice = promotionChoice
         #en passant
         self.isEnPassantMove = isEnPassantMove
         if self.isEnPassantMove:
@@ -677,7 +1036,23 @@ class Move():
         self.isCastleMove = isCastleMove
         #capture move
         self.isCaptureMove = self.pieceCaptured != "--"
-        self.moveID = self.startRow * 1000 + self.startCol * 100 + self.endRow * 10 + self.endCol #unique ID created for each move 0000-7777
+        #move code used by gameState and the search
+        self.moveCode = (self.startRow * 8 + self.startCol) | (self.endRow * 8 + self.endCol) << 6 | PROMOTION_PIECES.index(self.promotionChoice) << PROMOTION_SHIFT
+        if isEnPassantMove:
+            self.moveCode |= EN_PASSANT_FLAG
+        if isCastleMove:
+            self.moveCode |= CASTLE_FLAG
+        self.moveID = self.moveCode & MOVE_ID_MASK #unique ID for each move in a position, ignores the en passant and castle flags
+
+    """
+    Builds the Move object for a move code, using the board before the move is made
+    """
+    @classmethod
+    def fromMoveCode(cls, moveCode, board):
+        startSq = moveCode & 63
+        endSq = (moveCode >> 6) & 63
+        promotionChoice = PROMOTION_PIECES[(moveCode & PROMOTION_MASK) >> PROMOTION_SHIFT] or "Q"
+        return cls((startSq >> 3, startSq & 7), (endSq >> 3, endSq & 7), board, isEnPassantMove = moveCode & EN_PASSANT_FLAG != 0, isCastleMove = moveCode & CASTLE_FLAG != 0, promotionChoice = promotionChoice)
 
     """
     Overriding the equals method
@@ -687,8 +1062,14 @@ class Move():
             return self.moveID == other.moveID
         return False
 
+    """
+    Overriding the hash method so moves can be used in sets and as dictionary keys
+    """
+    def __hash__(self):
+        return self.moveID
+
     def getChessNotation(self):
-        return self.getRankFile(self.startRow, self.startCol) + self.getRankFile(self.endRow, self.endCol)
+        return self.getRankFile(self.startRow, self.startCol) + self.getRankFile(self.endRow, self.endCol) + self.promotionChoice.lower()
 
     def getRankFile(self, r, c):
         return self.colsToFiles[c] + self.rowsToRanks[r]
@@ -704,6 +1085,8 @@ class Move():
         endSquare = self.getRankFile(self.endRow, self.endCol)
         #pawn moves
         if self.pieceMoved[1] == "P":
+            if self.isPawnPromotion:
+                endSquare += "=" + self.promotionChoice #show the piece promoted to
             if self.isCaptureMove:
                 return self.colsToFiles[self.startCol] + "x" + endSquare
             else:
@@ -6,7 +6,7 @@ It is responsible for handling user input and displaying the current gameState o
 import pygame as p
 import chessEngine
 import chessAI
-from multiprocessing import Process, Queue
+import chessWorker
 import sys
 import asyncio
 import sqlite3
@@ -26,6 +26,8 @@ MOVE_LOG_PANEL_HEIGHT = HEIGHT
 DIMENSION = 8 #dimensions of a chessboard are 8x8
 SQ_SIZE = HEIGHT // DIMENSION #size of a square
 MAX_FPS = 15 #for animations later on
+PONDER = True #the AI thinks about its next move during the human's turn
+AI_SEED = None #set to a number to make the AI play the same moves every game (as long as no ponder search on a wrong guess is stopped part way, which changes what it has learnt)
 IMAGES = {}
 
 """
@@ -45,7 +47,7 @@ def main(settings):
     clock = p.time.Clock()
     screen.fill(p.Color("white"))
     moveLogFont = p.font.SysFont("Arial", 14, False, False) #font for move log
-    gs = chessEngine.gameState() #creates a gameState object
+    gs = chessAI.newGameState() #creates a gameState object using the backend chosen in chessAI
     validMoves = gs.getValidMoves() #returns all the valid moves on the board
     moveMade = False #flag variable for when a move has been made
     animate = False #flag variable for when we should animate a move
@@ -58,12 +60,17 @@ def main(settings):
     playerTwo = settings[2] #same as above but for black
     AIThinking = False #returns if the AI is thinking of a move or not
     moveUndone = False #returns if a move has been undone or not
-    moveFinderProcess = None
+    engine = None #long-lived AI worker, so the AI keeps what it has learnt between moves
+    if settings[3] in chessAI.DIFFICULTY_LEVELS: #every difficulty is the same search with a different node budget
+        engine = chessWorker.EngineWorker(difficulty = settings[3], seed = AI_SEED)
+        engine.newGame()
 
     while running:
         humanTurn = (gs.whiteToMove and playerOne) or (not gs.whiteToMove and playerTwo) #returns if a human is playing this turn or not
         for e in p.event.get():
             if e.type == p.QUIT:
+                if engine is not None:
+                    engine.quit() #end the worker process
                 running = False
                 p.quit()
                 sys.exit()
@@ -71,6 +78,8 @@ def main(settings):
             elif e.type == p.MOUSEBUTTONDOWN:
                 if gameOver:
                     if END_BUTTON.checkForInput(MENU_MOUSE_POS): #if left click on end button
+                        if engine is not None:
+                            engine.quit() #end the worker process
                         endGame(settings, gs.whiteToMove, gs.stalemate) #call endGame function
                 if not gameOver:
                     location = p.mouse.get_pos() #returns (x, y) location of mouse
@@ -101,51 +110,38 @@ def main(settings):
                     moveMade = True #flags the moveMade as true
                     animate = False #flags the animate as false
                     gameOver = False #flags the gameOver as false
-                    if AIThinking:
-                        moveFinderProcess.terminate() #stop thinking
-                        AIThinking = False
+                    if engine is not None:
+                        engine.stop() #stop thinking or pondering
+                    AIThinking = False
                     moveUndone = True #move has been undone
 
                 if e.key == p.K_r: #reset board when "r" is pressed
-                    gs = chessEngine.gameState() #create a new gameState
+                    gs = chessAI.newGameState() #create a new gameState
                     validMoves = gs.getValidMoves() #get new valid moves
                     sqSelected = () #reset
                     playerClicks = [] #reset
                     moveMade = False #reset
                     animate = False #reset
                     gameOver = False #reset
-                    if AIThinking:
-                        moveFinderProcess.terminate() #stop thinking
-                        AIThinking = False
+                    AIThinking = False
+                    if engine is not None:
+                        engine.newGame() #forget what was learnt from the old game
                     moveUndone = False #reset
 
         #AI move finder logic
         if not gameOver and not humanTurn and not moveUndone: #if game isnt over and a human isnt playing this turn and a move has not been undone
             if not AIThinking:
-                #set AI difficulty
-                if settings[3] == "easy":
-                    gs.makeMove(chessAI.findRandomMove(validMoves))
-                    moveMade = True #flags the moveMade as true
-                    animate = True #flags the animate as true
-                elif settings[3] == "medium":
-                    gs.makeMove(chessAI.findGreedyMove(gs, validMoves))
-                    moveMade = True #flags the moveMade as true
-                    animate = True #flags the animate as true
-                elif settings[3] == "hard":
-                    AIThinking = True #start thinking
-                    returnQueue = Queue() #create a queue
-                    moveFinderProcess = Process(target=chessAI.findBestMoveNegaMaxAlphaBeta, args=(gs, validMoves, returnQueue)) #create a process
-                    moveFinderProcess.start() #call process
-            
-            if settings[3] == "hard":
-                if not moveFinderProcess.is_alive(): #if done thinking
-                    AIMove = returnQueue.get() #get the move
-                    if AIMove is None: #if AIMove is equal to None
-                        AIMove = chessAI.findRandomMove(validMoves) #get a random move
-                    gs.makeMove(AIMove) #make the suggested move
-                    moveMade = True #flags the moveMade as true
-                    animate = True #flags the animate as true
-                    AIThinking = False #done thinking
+                AIThinking = True #start thinking
+                engine.think(gs.moveLog) #sends the moves played so far, it searches until its difficulty's node budget is used up (including any nodes spent pondering on the right move)
+
+            if engine.poll(): #if done thinking
+                AIMove = chessAI.moveFromCode(gs, engine.bestMove) #get the move
+                if AIMove is None: #if AIMove is equal to None
+                    AIMove = chessAI.findRandomMove(validMoves) #get a random move
+                gs.makeMove(AIMove) #make the suggested move
+                moveMade = True #flags the moveMade as true
+                animate = True #flags the animate as true
+                AIThinking = False #done thinking
 
         if moveMade:
             if animate:
@@ -155,6 +151,10 @@ def main(settings):
             animate = False #flags the animate back to false
             moveUndone = False #flags the moveUndone back to false
 
+        #pondering - while the human thinks, the AI searches the position after the reply it expects
+        if PONDER and engine is not None and humanTurn and not gameOver and engine.ponderMove is not None and engine.ponderMove in [move.moveCode for move in validMoves]:
+            engine.ponder(gs.moveLog)
+
         drawGameState(screen, gs, validMoves, sqSelected, moveLogFont)
 
         if gs.checkmate or gs.stalemate:
@@ -0,0 +1,224 @@
+"""
+This module holds the transposition table - a fixed size store of search results keyed by the Zobrist key of a position.
+When the search reaches a position it has already searched (through a different move order) it can reuse the result instead of searching it again.
+SharedTranspositionTable is the same table in shared memory, so searches running in several processes can all use it.
+"""
+
+from multiprocessing import shared_memory
+
+#bound types - what the stored score means
+EXACT = 0 #the score is the true score of the position
+LOWER = 1 #the search failed high, so the true score is at least the stored score
+UPPER = 2 #the search failed low, so the true score is at most the stored score
+
+#replacement policies
+DEPTH_PREFERRED = "depth" #each bucket has a slot that keeps the deepest entry and a slot that is always replaced
+ALWAYS_REPLACE = "always" #each bucket has one slot and a new entry always replaces what is there
+
+ENTRY_BYTES = 120 #rough memory used by one entry in CPython (three list slots plus the key, data and score objects)
+
+"""
+The depth, bound, best move and search generation of an entry are packed into one int, so each entry is just a key, a data int and a score.
+bits 0-16: best move code (0 for none)
+bits 17-24: depth
+bits 25-26: bound type
+bits 27-32: search generation, used to replace entries left over from earlier searches
+"""
+MOVE_MASK = (1 << 17) - 1
+DEPTH_SHIFT = 17
+BOUND_SHIFT = 25
+GENERATION_SHIFT = 27
+
+class TranspositionTable():
+    def __init__(self, sizeMB = 16, policy = DEPTH_PREFERRED):
+        self.policy = policy
+        self.slotsPerBucket = 2 if policy == DEPTH_PREFERRED else 1
+        entries = 1
+        while entries * 2 * ENTRY_BYTES <= sizeMB * 1024 * 1024: #biggest power of 2 that fits in the size
+            entries *= 2
+        self.bucketMask = entries // self.slotsPerBucket - 1 #a key's bucket is key & bucketMask
+        self.generation = 0
+        self.keys = [0] * entries #Zobrist key stored in each slot, 0 for an empty slot
+        self.data = [0] * entries #packed depth, bound, move and generation for each slot
+        self.scores = [0] * entries #score stored in each slot
+        self.resetCounters()
+
+    """
+    Empties the table
+    """
+    def clear(self):
+        entries = len(self.keys)
+        self.keys = [0] * entries
+        self.data = [0] * entries
+        self.scores = [0] * entries
+        self.generation = 0
+        self.resetCounters()
+
+    def resetCounters(self):
+        self.probes = 0 #number of lookups
+        self.hits = 0 #lookups that found the position
+        self.collisions = 0 #lookups that found other positions in the bucket but not this one
+        self.stores = 0 #number of entries written
+        self.replacements = 0 #entries written over a different position
+
+    """
+    Called at the start of each search. Entries from earlier searches can then be replaced even if they are deeper, and the counters start again
+    """
+    def newSearch(self):
+        self.generation = (self.generation + 1) & 63
+        self.resetCounters()
+
+    """
+    Looks the position up. Returns (depth, score, bound, move) if it is in the table, otherwise None
+    """
+    def probe(self, key):
+        self.probes += 1
+        slot = (key & self.bucketMask) * self.slotsPerBucket
+        keys = self.keys
+        for i in range(slot, slot + self.slotsPerBucket):
+            if keys[i] == key:
+                self.hits += 1
+                data = self.data[i]
+                return (data >> DEPTH_SHIFT) & 255, self.scores[i], (data >> BOUND_SHIFT) & 3, data & MOVE_MASK
+        if keys[slot] != 0: #bucket is in use by a different position
+            self.collisions += 1
+        return None
+
+    """
+    Stores the result of searching a position to the given depth
+    """
+    def store(self, key, depth, score, bound, move):
+        self.stores += 1
+        slot = (key & self.bucketMask) * self.slotsPerBucket
+        keys = self.keys
+        if self.slotsPerBucket == 2 and keys[slot] != key:
+            #keep the depth-preferred slot unless this entry is at least as deep or the slot is from an old search, otherwise use the always-replace slot
+            oldData = self.data[slot]
+            if keys[slot] != 0 and (oldData >> GENERATION_SHIFT) == self.generation and ((oldData >> DEPTH_SHIFT) & 255) > depth:
+                slot += 1
+        if keys[slot] != 0 and keys[slot] != key:
+            self.replacements += 1
+        keys[slot] = key
+        self.data[slot] = (move or 0) | depth << DEPTH_SHIFT | bound << BOUND_SHIFT | self.generation << GENERATION_SHIFT
+        self.scores[slot] = score
+
+    """
+    Returns the counters as a dictionary
+    """
+    def getStats(self):
+        return {"probes": self.probes, "hits": self.hits, "collisions": self.collisions, "stores": self.stores, "replacements": self.replacements,
+                "hitRate": self.hits / self.probes if self.probes else 0}
+
+SHARED_ENTRY_BYTES = 16 #two 64-bit words per entry in the shared table
+SCORE_SHIFT = 33 #the shared table also packs the score into the data word, above the generation
+SCORE_OFFSET = 1 << 30 #added to the score so it is never negative when packed
+
+"""
+A transposition table in multiprocessing.shared_memory, for searches running in several processes at once (Lazy SMP).
+Each entry is two 64-bit words: the key XOR the data, then the data (move, depth, bound, generation and score all packed together).
+Processes read and write entries without any locks. If two writes to an entry mix, the key XOR data check fails and the entry is treated as empty instead of giving a wrong result.
+It has the same methods as TranspositionTable. The counters are kept by each process separately.
+"""
+class SharedTranspositionTable():
+    def __init__(self, sizeMB = 16, policy = DEPTH_PREFERRED, name = None):
+        self.sizeMB = sizeMB
+        self.policy = policy
+        self.slotsPerBucket = 2 if policy == DEPTH_PREFERRED else 1
+        entries = 1
+        while entries * 2 * SHARED_ENTRY_BYTES <= sizeMB * 1024 * 1024: #biggest power of 2 that fits in the size
+            entries *= 2
+        self.entries = entries
+        self.bucketMask = entries // self.slotsPerBucket - 1 #a key's bucket is key & bucketMask
+        self.generation = 0
+        self.owner = name is None #the process that made the table frees it
+        if self.owner:
+            self.memory = shared_memory.SharedMemory(create = True, size = entries * SHARED_ENTRY_BYTES) #starts zeroed, so every entry is empty
+        else: #opening the table made by another process
+            self.memory = shared_memory.SharedMemory(name = name)
+        self.words = self.memory.buf.cast("Q")
+        self.resetCounters()
+
+    """
+    Only the name of the shared memory is sent to other processes, which then open it themselves
+    """
+    def __getstate__(self):
+        return {"sizeMB": self.sizeMB, "policy": self.policy, "name": self.memory.name, "generation": self.generation}
+
+    def __setstate__(self, state):
+        self.__init__(state["sizeMB"], state["policy"], state["name"])
+        self.generation = state["generation"]
+
+    """
+    Closes the table in this process, and frees the shared memory if this process made it
+    """
+    def close(self):
+        self.words.release()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+    """
+    Empties the table for every process using it
+    """
+    def clear(self):
+        self.memory.buf[:self.entries * SHARED_ENTRY_BYTES] = bytes(self.entries * SHARED_ENTRY_BYTES)
+        self.generation = 0
+        self.resetCounters()
+
+    def resetCounters(self):
+        self.probes = 0 #number of lookups
+        self.hits = 0 #lookups that found the position
+        self.collisions = 0 #lookups that found other positions in the bucket but not this one
+        self.stores = 0 #number of entries written
+        self.replacements = 0 #entries written over a different position
+
+    """
+    Called at the start of each search. Every process using the table has to call it for each search so their generations stay the same
+    """
+    def newSearch(self):
+        self.generation = (self.generation + 1) & 63
+        self.resetCounters()
+
+    """
+    Looks the position up. Returns (depth, score, bound, move) if it is in the table, otherwise None
+    """
+    def probe(self, key):
+        self.probes += 1
+        slot = (key & self.bucketMask) * self.slotsPerBucket
+        words = self.words
+        for i in range(slot * 2, (slot + self.slotsPerBucket) * 2, 2):
+            data = words[i + 1]
+            if words[i] ^ data == key:
+                self.hits += 1
+                return (data >> DEPTH_SHIFT) & 255, (data >> SCORE_SHIFT) - SCORE_OFFSET, (data >> BOUND_SHIFT) & 3, data & MOVE_MASK
+        if words[slot * 2 + 1] != 0: #bucket is in use by a different position
+            self.collisions += 1
+        return None
+
+    """
+    Stores the result of searching a position to the given depth
+    """
+    def store(self, key, depth, score, bound, move):
+        self.stores += 1
+        slot = (key & self.bucketMask) * self.slotsPerBucket
+        words = self.words
+        oldData = words[slot * 2 + 1]
+        oldKey = words[slot * 2] ^ oldData
+        if self.slotsPerBucket == 2 and oldKey != key:
+            #keep the depth-preferred slot unless this entry is at least as deep or the slot is from an old search, otherwise use the always-replace slot
+            if oldData != 0 and ((oldData >> GENERATION_SHIFT) & 63) == self.generation and ((oldData >> DEPTH_SHIFT) & 255) > depth:
+                slot += 1
+                oldData = words[slot * 2 + 1]
+                oldKey = words[slot * 2] ^ oldData
+        if oldData != 0 and oldKey != key:
+            self.replacements += 1
+        data = (move or 0) | depth << DEPTH_SHIFT | bound << BOUND_SHIFT | self.generation << GENERATION_SHIFT | (int(score) + SCORE_OFFSET) << SCORE_SHIFT
+        words[slot * 2] = key ^ data
+        words[slot * 2 + 1] = data
+
+    """
+    Returns the counters as a dictionary
+    """
+    def getStats(self):
+        return {"probes": self.probes, "hits": self.hits, "collisions": self.collisions, "stores": self.stores, "replacements": self.replacements,
+                "hitRate": self.hits / self.probes if self.probes else 0}
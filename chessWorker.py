@@ -0,0 +1,277 @@
+"""
+This module runs the AI in one long-lived worker process instead of starting a new process for every move.
+The worker keeps its own gameState and chessAI.Searcher (with its transposition table and move ordering tables) between moves, so each search starts warm.
+The GUI talks to it through a command queue and gets the best moves back through a result queue.
+With chessAI.THREADS above 1 it also runs helper processes that search the same position and share the transposition table in shared memory (Lazy SMP).
+The helpers never report a move, but the entries they store let the main worker search deeper in the same time.
+Run "python chessWorker.py [seconds] [threads ...]" to see how deep each number of threads gets,
+or "python chessWorker.py rootsplit [depth] [workers]" to compare chessAI's root split search with the single process search.
+"""
+
+import sys
+import queue
+import threading
+import time
+from multiprocessing import Process, Queue
+import chessEngine
+import chessAI
+import chessTransposition
+
+#commands the worker understands, each sent as a tuple starting with the command
+NEW_GAME = "newgame" #(NEW_GAME,) - forget everything learnt from the last game
+POSITION = "position" #(POSITION, fen, moveCodes) - the position after playing moveCodes from fen
+GO = "go" #(GO, searchId, timeLimit, ponder, remainingTime, increment) - start searching the position, timeLimit None for chessAI.allocateTime's share of remainingTime (seconds left on the clock) and increment, or chessAI.TIME_LIMIT (or only the node budget with a difficulty) if remainingTime is None too. A ponder search has no time limit until PONDER_HIT
+PONDER_HIT = "ponderhit" #(PONDER_HIT,) - the move being pondered was played, so the search now has until timeLimit after it started
+STOP = "stop" #(STOP,) - finish the search now and send back the best move found so far
+QUIT = "quit" #(QUIT,) - stop the worker process
+
+"""
+The worker process. Commands are read here while the search runs in a thread, so STOP can interrupt it through the searcher's stop.
+Each finished search puts (searchId, moveCode, ponderMove, stats) on the result queue, moveCode being None if no move was found, ponderMove the reply it expects and stats the search's statistics from chessAI.Searcher.getSearchStats.
+The main worker passes every command on to the helpers' command queues and stops them when its own search ends.
+A helper has no result queue. It searches until it is stopped, starting one iteration deeper than the main worker if its index is odd.
+difficulty is one of chessAI.DIFFICULTY_LEVELS, or None for no node budget. The helpers have no budget, the main worker stops them.
+"""
+def runWorker(commandQueue, resultQueue, sharedTable = None, helperQueues = (), helperIndex = 0, difficulty = None, seed = 0):
+    searcher = chessAI.Searcher(transpositionTable = sharedTable, seed = None if seed is None else seed + helperIndex) #makes its own table when there is no shared one, each helper shuffles the root moves differently
+    if difficulty is not None:
+        searcher.setDifficulty(difficulty)
+    gs = chessAI.newGameState()
+    positionFEN = chessEngine.STARTING_FEN #position gs was set up from, before the moves in its move log
+    searchThread = None
+    ponderStart = 0 #time.perf_counter() when the ponder search started
+    ponderTimeLimit = 0 #time the ponder search gets from when it started, once the move it is pondering is played
+    stopTimer = None #stops a ponder search once its time is up
+
+    def search(searchId, timeLimit):
+        bestMove = searcher.findBestMoveIterativeDeepening(gs, gs.getValidMoves(), timeLimit, depthOffset = helperIndex % 2)
+        for helperQueue in helperQueues: #the helpers have no time limit of their own
+            helperQueue.put((STOP,))
+        if resultQueue is None: #helper
+            return
+        if bestMove is None:
+            resultQueue.put((searchId, None, None, searcher.stats))
+        else:
+            resultQueue.put((searchId, bestMove.moveCode, searcher.getPonderMove(gs, bestMove.moveCode), searcher.stats))
+
+    def stopThread(thread):
+        while thread is not None and thread.is_alive():
+            searcher.stop() #called again until the thread ends, in case the search hadn't started and would clear it
+            thread.join(0.01)
+
+    while True:
+        command = commandQueue.get()
+        for helperQueue in helperQueues:
+            helperQueue.put(command)
+        if command[0] != PONDER_HIT and stopTimer is not None:
+            stopTimer.cancel()
+            stopTimer = None
+        if command[0] not in (GO, PONDER_HIT):
+            stopThread(searchThread) #every other command needs the search to have finished first
+        if command[0] == NEW_GAME:
+            positionFEN = chessEngine.STARTING_FEN
+            gs.setFEN(positionFEN)
+            searcher.newGame()
+        elif command[0] == POSITION:
+            fen, moveCodes = command[1], command[2]
+            playedCodes = [move if type(move) is int else move.moveCode for move in gs.moveLog]
+            samePlies = 0 #moves shared by the game so far and the new move list, only the rest have to be undone or played
+            if fen != positionFEN:
+                positionFEN = fen
+                gs.setFEN(fen)
+            else:
+                while samePlies < min(len(playedCodes), len(moveCodes)) and playedCodes[samePlies] == moveCodes[samePlies]:
+                    samePlies += 1
+                for i in range(len(playedCodes) - samePlies): #e.g. a wrong ponder guess or a move taken back
+                    gs.undoMove()
+            for moveCode in moveCodes[samePlies:]:
+                gs.makeMove(moveCode)
+        elif command[0] == GO:
+            stopThread(searchThread)
+            searchId, timeLimit, ponder, remainingTime, increment = command[1:6]
+            if timeLimit is None and remainingTime is not None: #playing on a clock
+                timeLimit = chessAI.allocateTime(remainingTime, increment)
+            if resultQueue is None: #helpers search until the main worker stops them
+                timeLimit = float("inf")
+            elif ponder: #search until PONDER_HIT or STOP
+                ponderStart = time.perf_counter()
+                if timeLimit is None:
+                    timeLimit = chessAI.TIME_LIMIT if searcher.nodeLimit is None else float("inf") #the same time a normal search would get
+                ponderTimeLimit = timeLimit
+                timeLimit = float("inf")
+            searchThread = threading.Thread(target=search, args=(searchId, timeLimit), daemon=True)
+            searchThread.start()
+        elif command[0] == PONDER_HIT and resultQueue is not None and ponderTimeLimit != float("inf"): #time spent pondering counts, so if the human took long enough the move is ready straight away
+            stopTimer = threading.Timer(max(ponderStart + ponderTimeLimit - time.perf_counter(), 0), stopThread, args=(searchThread,))
+            stopTimer.start()
+        elif command[0] == QUIT:
+            return
+
+"""
+The GUI side of the worker. Starts the worker process, and the helper processes when there is more than 1 thread, then sends the worker commands.
+difficulty sets the worker's node budget from chessAI.DIFFICULTY_LEVELS. seed makes its searches repeatable, None for different moves every game
+"""
+class EngineWorker():
+    def __init__(self, threads = None, difficulty = None, seed = 0):
+        if threads is None:
+            threads = chessAI.THREADS
+        self.commandQueue = Queue()
+        self.resultQueue = Queue()
+        self.sharedTable = None
+        self.helpers = []
+        helperQueues = []
+        if threads > 1: #the helpers are started here since the worker is a daemon, and daemon processes can't start their own
+            self.sharedTable = chessTransposition.SharedTranspositionTable(chessAI.TT_SIZE_MB, chessAI.TT_POLICY)
+            for helperIndex in range(1, threads):
+                helperQueues.append(Queue())
+                self.helpers.append(Process(target=runWorker, args=(helperQueues[-1], None, self.sharedTable, (), helperIndex, None, seed), daemon=True))
+                self.helpers[-1].start()
+        self.process = Process(target=runWorker, args=(self.commandQueue, self.resultQueue, self.sharedTable, helperQueues, 0, difficulty, seed), daemon=True) #daemon, so it ends with the GUI
+        self.process.start()
+        self.searchId = 0 #id of the latest search, results from searches that were stopped are ignored
+        self.thinking = False
+        self.pondering = False #True while searching the position after the move the human is expected to play
+        self.bestMove = None #move code found by the last search that finished
+        self.depth = 0 #deepest iteration the last search that finished completed
+        self.stats = {} #statistics of the last search that finished
+        self.ponderMove = None #reply that search expects, to ponder on
+        self.ponderedMove = None #move the current ponder search assumes was played
+
+    """
+    Forgets the last game, clearing the transposition table and history scores
+    """
+    def newGame(self):
+        self.thinking = self.pondering = False
+        self.ponderMove = None
+        self.commandQueue.put((NEW_GAME,))
+
+    """
+    Sends the position reached by playing moves (Move objects or move codes) from fen
+    """
+    def setPosition(self, moves, fen = chessEngine.STARTING_FEN):
+        self.commandQueue.put((POSITION, fen, [move if type(move) is int else move.moveCode for move in moves]))
+
+    """
+    Starts searching the position last sent, for timeLimit seconds. Without a timeLimit, remainingTime is the seconds left on the engine's clock and increment what it gains each move,
+    and the time for the move is worked out from them with chessAI.allocateTime
+    """
+    def go(self, timeLimit = None, ponder = False, remainingTime = None, increment = 0):
+        self.searchId += 1
+        self.thinking = True
+        self.pondering = ponder
+        self.bestMove = None
+        self.commandQueue.put((GO, self.searchId, timeLimit, ponder, remainingTime, increment))
+
+    """
+    Starts searching the position after the reply the last search expects, while the human is still thinking. Returns False if there is no reply to ponder on
+    """
+    def ponder(self, moves, timeLimit = None, remainingTime = None, increment = 0):
+        if self.thinking or self.ponderMove is None:
+            return False
+        self.ponderedMove = self.ponderMove
+        self.ponderMove = None
+        self.setPosition(list(moves) + [self.ponderedMove])
+        self.go(timeLimit, True, remainingTime, increment)
+        return True
+
+    """
+    Starts finding a move for the position after moves. If the last move is the one being pondered the ponder search carries on, otherwise it is stopped and a new search started
+    """
+    def think(self, moves, timeLimit = None, remainingTime = None, increment = 0):
+        lastMove = moves[-1] if moves else None
+        if self.pondering and lastMove is not None and (lastMove if type(lastMove) is int else lastMove.moveCode) == self.ponderedMove:
+            self.pondering = False
+            self.commandQueue.put((PONDER_HIT,))
+            return
+        self.stop()
+        self.setPosition(moves)
+        self.go(timeLimit, remainingTime = remainingTime, increment = increment)
+
+    """
+    Stops the search. Its move is thrown away
+    """
+    def stop(self):
+        self.ponderMove = None #it was a reply to a position that is no longer on the board
+        if self.thinking:
+            self.thinking = self.pondering = False
+            self.commandQueue.put((STOP,))
+
+    """
+    Returns True once the search started by go or think has finished, with its move code in self.bestMove. A ponder search is never finished until the move it is pondering is played
+    """
+    def poll(self):
+        while self.thinking and not self.pondering:
+            try:
+                searchId, moveCode, ponderMove, stats = self.resultQueue.get_nowait()
+            except queue.Empty: #still thinking
+                return False
+            if searchId == self.searchId: #not the result of a search that was stopped
+                self.bestMove = moveCode
+                self.ponderMove = ponderMove
+                self.depth = stats["depth"]
+                self.stats = stats
+                self.thinking = False
+        return not self.thinking
+
+    """
+    Ends the worker process and its helpers
+    """
+    def quit(self):
+        self.stop()
+        self.commandQueue.put((QUIT,))
+        self.process.join(1)
+        for helper in self.helpers:
+            helper.join(1)
+        if self.sharedTable is not None:
+            self.sharedTable.close()
+
+"""
+Searches each position for timeLimit seconds with every number of threads, printing the average depth finished.
+Lazy SMP is working if more threads reach deeper in the same time, which needs that many free cores.
+"""
+def measureScaling(fens, threadCounts = (1, 2, 4, 8), timeLimit = 2.0):
+    for threads in threadCounts:
+        engine = EngineWorker(threads)
+        depths = []
+        for fen in fens:
+            engine.newGame()
+            engine.setPosition([], fen)
+            engine.go(timeLimit)
+            while not engine.poll():
+                time.sleep(0.01)
+            depths.append(engine.depth)
+        engine.quit()
+        print("threads", threads, "depths", depths, "average depth", round(sum(depths) / len(depths), 2))
+
+"""
+Times the root split search (Searcher.findBestMoveRootSplit) against the single process Searcher.findBestMoveNegaMaxAlphaBeta at the same depth on each position, printing the speedup
+"""
+def measureRootSplit(fens, depth = 3, workers = None):
+    chessAI.getSearchPool(workers) #start the pool first, so its start up isn't counted against the first move
+    searcher = chessAI.Searcher(depth)
+    totalSingle = totalSplit = 0
+    for fen in fens:
+        gs = chessAI.newGameState(fen)
+        searcher.newGame()
+        start = time.perf_counter()
+        singleMove = searcher.findBestMoveNegaMaxAlphaBeta(gs, gs.getValidMoves())
+        singleTime = time.perf_counter() - start
+        searcher.newGame() #otherwise the root split would start with the best move the single search just stored
+        start = time.perf_counter()
+        splitMove = searcher.findBestMoveRootSplit(gs, gs.getValidMoves())
+        splitTime = time.perf_counter() - start
+        totalSingle += singleTime
+        totalSplit += splitTime
+        print(fen, "single", singleMove, round(singleTime, 2), "root split", splitMove, round(splitTime, 2), "speedup", round(singleTime / splitTime, 2))
+    print("depth", depth, "single", round(totalSingle, 2), "root split", round(totalSplit, 2), "speedup", round(totalSingle / totalSplit, 2))
+
+if __name__ == "__main__":
+    import perft
+    fens = [fen for fen, counts, testDepth in perft.POSITIONS.values()]
+    if len(sys.argv) > 1 and sys.argv[1] == "rootsplit":
+        measureRootSplit(fens, int(sys.argv[2]) if len(sys.argv) > 2 else 3, int(sys.argv[3]) if len(sys.argv) > 3 else None)
+        chessAI.shutdownSearchPool()
+    else:
+        timeLimit = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+        threadCounts = tuple(int(arg) for arg in sys.argv[2:]) or (1, 2, 4, 8)
+        measureScaling(fens, threadCounts, timeLimit)
@@ -0,0 +1,115 @@
+"""
+This module counts the number of positions reachable after a number of moves (perft).
+It checks that the move generators are correct by comparing against known counts for standard positions and by comparing the 8x8 board backend with the bitboard backend.
+It also reports how fast each backend generates moves in nodes per second.
+Run it with:
+    python perft.py test - checks every standard position against its known counts on both backends
+    python perft.py [depth] [position] - perft on both backends, then compares them move by move
+    python perft.py divide depth [position] - the perft count below each root move
+"""
+
+import sys
+import time
+import chessEngine
+import chessBitboard
+
+"""
+Standard perft positions with their known node counts for depth 1, 2, 3...
+testDepth is how deep "python perft.py test" goes, kept low enough to run in a few seconds.
+"""
+POSITIONS = {
+    "start": ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", (20, 400, 8902, 197281, 4865609), 4),
+    "kiwipete": ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", (48, 2039, 97862, 4085603), 3), #castling, pins and en passant all at once
+    "position3": ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", (14, 191, 2812, 43238, 674624), 4), #en passant that would uncover a check along the row
+    "position4": ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", (6, 264, 9467, 422333), 3), #promotions, including capturing promotions
+    "position5": ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", (44, 1486, 62379, 2103487), 3),
+    "position6": ("r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10", (46, 2079, 89890, 3894594), 3),
+}
+BACKENDS = (("board", chessEngine.gameState), ("bitboard", chessBitboard.bitboardGameState))
+
+"""
+Returns the number of leaf positions reachable from gs in exactly depth moves
+"""
+def perft(gs, depth):
+    moves = gs.getValidMoveCodes()
+    if depth == 1: #no need to make the last moves, just count them
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        gs.makeMove(move)
+        nodes += perft(gs, depth-1)
+        gs.undoMove()
+    return nodes
+
+"""
+Returns a dictionary of the perft count below each root move, keyed by the move in chess notation
+"""
+def divide(gs, depth):
+    counts = {}
+    for move in gs.getValidMoves():
+        gs.makeMove(move)
+        counts[move.getChessNotation()] = perft(gs, depth-1) if depth > 1 else 1
+        gs.undoMove()
+    return counts
+
+"""
+Runs perft on both backends and prints any root moves where they disagree. Returns True if they agree
+"""
+def compareBackends(depth, fen = POSITIONS["start"][0]):
+    boardCounts = divide(chessEngine.gameState.fromFEN(fen), depth)
+    bitboardCounts = divide(chessBitboard.bitboardGameState.fromFEN(fen), depth)
+    agree = True
+    for notation in sorted(set(boardCounts) | set(bitboardCounts)):
+        if boardCounts.get(notation) != bitboardCounts.get(notation): #backends disagree about this move
+            print(notation, "board:", boardCounts.get(notation), "bitboard:", bitboardCounts.get(notation))
+            agree = False
+    return agree
+
+"""
+Runs perft and returns the node count and the time it took in seconds
+"""
+def timePerft(gs, depth):
+    start = time.perf_counter()
+    nodes = perft(gs, depth)
+    return nodes, time.perf_counter() - start
+
+"""
+Checks every standard position up to its test depth on both backends, printing the nodes per second. Returns True if every count is right.
+maxDepth caps the test depth, for a quicker check
+"""
+def runTests(maxDepth = None):
+    passed = True
+    for backendName, backend in BACKENDS:
+        totalNodes = totalTime = 0
+        for name, (fen, counts, testDepth) in POSITIONS.items():
+            if maxDepth is not None:
+                testDepth = min(testDepth, maxDepth)
+            nodes, seconds = timePerft(backend.fromFEN(fen), testDepth)
+            totalNodes += nodes
+            totalTime += seconds
+            ok = nodes == counts[testDepth-1]
+            passed = passed and ok
+            print(backendName, name, "depth", testDepth, "nodes", nodes, "expected", counts[testDepth-1], "ok" if ok else "FAILED", "nps", int(nodes / seconds) if seconds else 0)
+        print(backendName, "total nodes", totalNodes, "in", round(totalTime, 2), "seconds, nps", int(totalNodes / totalTime) if totalTime else 0)
+    print("All perft counts correct" if passed else "Some perft counts are wrong")
+    return passed
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "test":
+        sys.exit(0 if runTests() else 1)
+    elif len(sys.argv) > 1 and sys.argv[1] == "divide":
+        depth = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+        fen = POSITIONS[sys.argv[3] if len(sys.argv) > 3 else "start"][0]
+        counts = divide(chessEngine.gameState.fromFEN(fen), depth)
+        for notation in sorted(counts):
+            print(notation, counts[notation])
+        print("moves", len(counts), "nodes", sum(counts.values()))
+    else:
+        depth = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+        name = sys.argv[2] if len(sys.argv) > 2 else "start"
+        fen, counts, testDepth = POSITIONS[name]
+        for backendName, backend in BACKENDS:
+            nodes, seconds = timePerft(backend.fromFEN(fen), depth)
+            expected = counts[depth-1] if depth <= len(counts) else "unknown"
+            print(backendName, name, "perft", depth, "=", nodes, "expected", expected, "in", round(seconds, 2), "seconds, nps", int(nodes / seconds) if seconds else 0)
+        print("Backends agree" if compareBackends(depth, fen) else "Backends disagree")
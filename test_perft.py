@@ -0,0 +1,20 @@
+"""
+Runs the perft checks of perft.py at shallow depths, so the move generators of both backends are checked with the rest of the tests
+"""
+
+import pytest
+import perft
+
+"""
+Every standard position gives its known counts on both backends
+"""
+@pytest.mark.parametrize("depth", (1, 2))
+def test_run_tests(depth):
+    assert perft.runTests(depth)
+
+"""
+The backends agree on every root move of every standard position
+"""
+@pytest.mark.parametrize("name", perft.POSITIONS)
+def test_backends_agree(name):
+    assert perft.compareBackends(2, perft.POSITIONS[name][0])
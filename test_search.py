@@ -0,0 +1,128 @@
+"""
+Regression checks for the search in chessAI
+"""
+
+import pytest
+import chessAI
+
+STALEMATE_TRAPS = ("k2K4/2Q5/8/8/8/8/8/8 w - - 0 1", "k2K4/3Q4/8/8/8/8/8/8 w - - 0 1") #won positions where a careless move stalemates
+ALL_MOVES_MATED = "4QK1k/p7/8/8/8/8/8/8 b - - 0 1" #every move gets mated, the search still has to pick one
+
+"""
+A stalemate has to score as a draw, not as a mate, so the winning side never plays one
+"""
+@pytest.mark.parametrize("fen", STALEMATE_TRAPS)
+@pytest.mark.parametrize("depth", (2, 3))
+def test_no_stalemate_when_winning(fen, depth):
+    searcher = chessAI.Searcher(depth, seed = 0)
+    gs = chessAI.newGameState(fen)
+    move = searcher.findBestMovePrincipalVariation(gs, gs.getValidMoves())
+    gs.makeMove(move)
+    gs.getValidMoves()
+    assert not gs.stalemate
+
+"""
+The search returns a move even when every move loses
+"""
+def test_move_found_when_every_move_is_mated():
+    searcher = chessAI.Searcher(3, seed = 0)
+    gs = chessAI.newGameState(ALL_MOVES_MATED)
+    assert searcher.findBestMovePrincipalVariation(gs, gs.getValidMoves()) is not None
+
+"""
+Mate scores count the plies to the mate, so the quickest mate is preferred and reported as such
+"""
+def test_shortest_mate_preferred():
+    searcher = chessAI.Searcher(4, seed = 0)
+    gs = chessAI.newGameState("6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1")
+    assert str(searcher.findBestMovePrincipalVariation(gs, gs.getValidMoves())) == "Rd8"
+    assert searcher.score == chessAI.CHECKMATE - 1
+
+"""
+Iterative deepening returns a move when every move is mated, with or without a node budget
+"""
+@pytest.mark.parametrize("difficulty", (None, "hard"))
+def test_iterative_deepening_move_found_when_every_move_is_mated(difficulty):
+    searcher = chessAI.Searcher(seed = 0)
+    if difficulty is not None:
+        searcher.setDifficulty(difficulty)
+    gs = chessAI.newGameState(ALL_MOVES_MATED)
+    assert searcher.findBestMoveIterativeDeepening(gs, gs.getValidMoves(), 1.0) is not None
+    assert searcher.score <= -chessAI.MATE_THRESHOLD
+
+"""
+The root split pool is rebuilt when a different number of workers is asked for, and finds the same move and score as the search it splits
+"""
+def test_root_split_pool_follows_workers():
+    gs = chessAI.newGameState("6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1")
+    try:
+        for workers in (1, 2):
+            searcher = chessAI.Searcher(2, seed = 0)
+            assert str(searcher.findBestMoveRootSplit(gs, gs.getValidMoves(), workers = workers)) == "Rd8"
+            assert searcher.score == chessAI.CHECKMATE - 1 #mate in one, counted from the root like the single process search
+            assert chessAI.searchPoolWorkers == workers
+            assert chessAI.searchPool._max_workers == workers
+    finally:
+        chessAI.shutdownSearchPool()
+
+"""
+With profileTime the timed methods are taken off gs again when the search ends, even if it raises
+"""
+def test_profiling_removed_when_search_raises():
+    searcher = chessAI.Searcher(2, seed = 0)
+    searcher.profileTime = True
+    gs = chessAI.newGameState()
+    def failingSearch(*args):
+        raise RuntimeError("search failed")
+    searcher.findMovePrincipalVariation = failingSearch
+    with pytest.raises(RuntimeError):
+        searcher.findBestMovePrincipalVariation(gs, gs.getValidMoves())
+    for name, category in chessAI.PROFILED_METHODS:
+        assert name not in gs.__dict__
+    assert "orderMoves" not in searcher.__dict__
+
+"""
+The search statistics count the transposition table collisions, and the info line shows them
+"""
+def test_search_stats_report_collisions():
+    searcher = chessAI.Searcher(3, seed = 0)
+    gs = chessAI.newGameState()
+    searcher.findBestMovePrincipalVariation(gs, gs.getValidMoves())
+    stats = searcher.stats
+    assert stats["ttCollisions"] == searcher.transpositionTable.collisions
+    assert "ttcollisions %d" % stats["ttCollisions"] in chessAI.formatInfo(stats)
+
+"""
+The time for a move is an even share of the clock plus most of the increment, and never more than half of what is left
+"""
+def test_allocate_time():
+    assert chessAI.allocateTime(60, 0) == 2
+    assert chessAI.allocateTime(60, 1) == 2.8
+    assert chessAI.allocateTime(1, 10) == 0.5
+
+"""
+Without a time limit, iterative deepening takes its time from the clock
+"""
+def test_iterative_deepening_uses_remaining_time():
+    searcher = chessAI.Searcher(seed = 0)
+    gs = chessAI.newGameState()
+    assert searcher.findBestMoveIterativeDeepening(gs, gs.getValidMoves(), remainingTime = 3) is not None
+    assert searcher.stats["time"] < chessAI.allocateTime(3) + 0.5 #a tenth of a second, where TIME_LIMIT would be 2
+
+"""
+Every node of the principal variation search is told whether it is in check correctly, including re-searches of moves whose first search changed gs.inCheck
+"""
+class CheckRecordingSearcher(chessAI.Searcher):
+    def findMovePrincipalVariation(self, gs, validMoves, inCheck, *args):
+        position = chessAI.newGameState(gs.toFEN())
+        position.getValidMoveCodes()
+        self.wrongInCheck += inCheck != position.inCheck
+        return super().findMovePrincipalVariation(gs, validMoves, inCheck, *args)
+
+@pytest.mark.parametrize("fen", ("r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10", "8/7p/5k2/5p2/p1p2P2/Pr1pPK2/1P1R3P/8 b - - 0 1"))
+def test_in_check_passed_to_every_node(fen):
+    searcher = CheckRecordingSearcher(seed = 0)
+    searcher.wrongInCheck = 0
+    gs = chessAI.newGameState(fen)
+    searcher.findBestMovePrincipalVariation(gs, gs.getValidMoves(), 4)
+    assert searcher.wrongInCheck == 0